@@ -7,3 +7,5 @@ with RaspberryPi() as rpi:
         rpi.set_pin_pwm(rpi.bl, i/10)
         time.sleep(0.5)
     rpi.set_pin_pwm(rpi.bl, 1)
+    rpi.backlight.fade(0, 2, wait=True)
+    rpi.backlight.fade(1, 2, wait=True)
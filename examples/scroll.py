@@ -0,0 +1,19 @@
+"""Scroll a log view using hardware scrolling."""
+import time
+from st7789v.interface import RaspberryPi
+from st7789v import Display
+
+colors = [(255, 0, 0), (255, 255, 0), (0, 255, 0), (0, 255, 255), (0, 0, 255), (255, 0, 255)]
+header = [(255, 255, 255)] * 240 * 16
+
+with RaspberryPi() as rpi:
+    display = Display(rpi)
+    display.initialize()
+    display.draw_rgb_bytes([(0, 0, 0)] * 240 * 320)
+    display.set_scroll_area(top_fixed=16)
+    display.write_rows(0, header)
+    for i in range(100):
+        # each new line only costs VSCSAD plus the 8 new rows
+        line = [colors[i % len(colors)]] * (8 * i % 240) + [(0, 0, 0)] * (240 - 8 * i % 240)
+        display.scroll(8, line * 8)
+        time.sleep(0.05)
@@ -1,6 +1,19 @@
 """ST7789V Display Controller."""
+import sys
 from .display import Display
-try:
-    from .buffered_display import BufferedDisplay
-except ImportError:
-    pass
+
+
+def __getattr__(name):
+    """Import `BufferedDisplay`, and PIL with it, when first used."""
+    if name == 'BufferedDisplay':
+        from .buffered_display import BufferedDisplay  # pylint: disable=C0415
+        return BufferedDisplay
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+if sys.version_info < (3, 7):
+    # module-level __getattr__ is not supported
+    try:
+        from .buffered_display import BufferedDisplay
+    except ImportError:
+        pass
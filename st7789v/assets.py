@@ -0,0 +1,137 @@
+"""Images stored on disk in the native format of the display."""
+import collections
+import hashlib
+import io
+import mmap
+import os
+
+# Default directory of the asset cache
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'st7789v')
+
+Asset = collections.namedtuple('Asset', ('width', 'height', 'data'))
+
+
+class AssetCache:
+    """Cache of images converted to the native format of the display.
+
+    Converted images are stored in files named after the hash of the source
+    file, the size and the color mode, and loaded with `mmap`, so that drawing
+    a cached image does not decode or convert it, nor import PIL. Recently
+    used assets are also kept in memory, and reloaded if their source file is
+    modified, in which case the files converted from its previous contents
+    are removed.
+    """
+
+    def __init__(self, directory=CACHE_DIR, memory_items=16):
+        """Create the cache.
+
+        Args:
+            directory:      directory to store converted images in, created if needed
+            memory_items:   number of assets to keep in memory
+        """
+        self.directory = directory
+        self.memory_items = memory_items
+        self._memory = collections.OrderedDict()
+
+    def get(self, path, display, size=None):
+        """Get an image in the current color mode of a display.
+
+        Args:
+            path:       image file to load, in any format supported by PIL
+            display:    `Display` whose color mode and dithering setting are used
+            size:       (width, height) to resize the image to, if needed
+
+        Returns:
+            An `Asset` (width, height, data) tuple, data being a memoryview of
+            the mapped file.
+        """
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, size,
+               display.color_mode['id'], display.dither)
+        asset = self._memory.get(key)
+        if asset is not None:
+            self._memory.move_to_end(key)
+            return asset
+        asset = self._load(path, display, size)
+        self._memory[key] = asset
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+        return asset
+
+    def draw(self, display, path, x=0, y=0, size=None):
+        """Draw an image from the cache, see `get` and `Display.blit`."""
+        asset = self.get(path, display, size)
+        return display.blit(x, y, asset.data, asset.width)
+
+    def clear(self):
+        """Remove all converted images, from memory and disk."""
+        self._memory.clear()
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(('.raw', '.size', '.source')):
+                    os.remove(os.path.join(self.directory, name))
+
+    def _load(self, path, display, size):
+        """Load an image from disk, converting it if it is not stored yet."""
+        with open(path, 'rb') as file:
+            content = file.read()
+        digest = hashlib.sha1(content).hexdigest()
+        image = None
+        if size is None:
+            # the size of the image is stored along with it, so that cached images are loaded without PIL
+            size = self._read_size(digest)
+        if size is None:
+            from PIL import Image  # pylint: disable=C0415
+            image = Image.open(io.BytesIO(content))
+            size = image.size
+            self._store(os.path.join(self.directory, digest + '.size'), ('%dx%d' % size).encode())
+        width, height = size
+        mode = display.color_mode
+        name = '%s-%dx%d-%02x%s.raw' % (digest, width, height, mode['id'], '-dither' if display.dither else '')
+        filename = os.path.join(self.directory, name)
+        length = (width * height * mode['bytes2'] + 1) // 2
+        if not os.path.exists(filename) or os.path.getsize(filename) != length:
+            self._prune(path, digest)
+            if image is None:
+                from PIL import Image  # pylint: disable=C0415
+                image = Image.open(io.BytesIO(content))
+            image = image.convert('RGB')
+            if image.size != (width, height):
+                image = image.resize((width, height))
+            self._store(filename, display.to_native(image))
+        with open(filename, 'rb') as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return Asset(width, height, memoryview(data))
+
+    def _read_size(self, digest):
+        """Get the stored (width, height) of an image, None if it is not known."""
+        try:
+            with open(os.path.join(self.directory, digest + '.size')) as file:
+                width, height = file.read().split('x')
+            return int(width), int(height)
+        except (OSError, ValueError):
+            return None
+
+    def _prune(self, path, digest):
+        """Remove the files converted from previous contents of a source file."""
+        source = os.path.join(self.directory, hashlib.sha1(os.path.abspath(path).encode()).hexdigest() + '.source')
+        try:
+            with open(source) as file:
+                previous = file.read().strip()
+        except OSError:
+            previous = None
+        if previous == digest:
+            return
+        if previous and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.startswith(previous + '-') or name == previous + '.size':
+                    os.remove(os.path.join(self.directory, name))
+        self._store(source, digest.encode())
+
+    def _store(self, filename, data):
+        """Write a converted image, atomically so that readers never see partial files."""
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = '%s.%d.tmp' % (filename, os.getpid())
+        with open(temporary, 'wb') as file:
+            file.write(data)
+        os.replace(temporary, filename)
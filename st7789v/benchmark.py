@@ -0,0 +1,234 @@
+"""Benchmarks for color conversion and frame pipelines.
+
+Run with `python3 -m st7789v.benchmark`, see `--help` for options.
+Pipelines are run against the `Counting` IO wrapper, so timings only include
+the Python side; the SPI transfer time is modelled from the SPI clock.
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from . import colors
+from . import lazy
+from .display import Display
+from .interface.counting import Counting
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+np = lazy.optional_import('numpy')
+
+WIDTH, HEIGHT = 320, 240
+REGIONS = ((16, 16), (64, 64), (160, 120), (320, 240))
+
+
+def measure(func, repeat):
+    """Call a function `repeat` times after a warm-up call, returning the durations in seconds."""
+    func()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def result(group, name, durations, size, spi_hz, **extra):
+    """Build a result entry.
+
+    Args:
+        group:      benchmark group
+        name:       benchmark name
+        durations:  list of durations in seconds
+        size:       number of bytes produced or sent over SPI
+        spi_hz:     SPI clock used to model the transfer time
+        **extra:    additional fields
+    """
+    median = statistics.median(durations)
+    transfer = size * 8 / spi_hz
+    entry = {
+        'group': group,
+        'name': name,
+        'ms': median * 1000,
+        'ms_min': min(durations) * 1000,
+        'bytes': size,
+        'mb_s': size / median / 1e6 if median else float('inf'),
+        'fps_model': 1 / (median + transfer) if median + transfer else float('inf'),
+    }
+    entry.update(extra)
+    return entry
+
+
+def sample_frame(width=WIDTH, height=HEIGHT, seed=0):
+    """Random RGB frame, as a list of (R, G, B) tuples."""
+    rand = random.Random(seed)
+    return [(rand.randrange(256), rand.randrange(256), rand.randrange(256)) for _ in range(width * height)]
+
+
+def bench_converters(repeat, spi_hz):
+    """Benchmark each converter of `colors.MODES` and the reference converters."""
+    results = []
+    frame = sample_frame()
+    array = np.asarray(frame, dtype=np.uint8) if np is not None else None
+    image = None
+    if Image is not None:
+        image = Image.new('RGB', (WIDTH, HEIGHT))
+        image.putdata(frame)
+    reference = {444: (colors.bytes_to_rgb_444, colors.image_to_rgb_444),
+                 565: (colors.bytes_to_rgb_565, colors.image_to_rgb_565),
+                 666: (colors.bytes_to_rgb_666, colors.image_to_rgb_666)}
+    for mode, info in colors.MODES.items():
+        cases = [('func', info['func'], frame), ('reference_func', reference[mode][0], frame)]
+        if array is not None:
+            cases.append(('func_array', info['func'], array))
+            if info['array'] is not None:
+                out = bytearray(len(frame) * 3)
+                cases.append(('array', lambda a, f=info['array'], o=out: f(a, o), array))
+            if info['dither'] is not None:
+                out = bytearray(len(frame) * 3)
+                cases.append(('dither', lambda a, f=info['dither'], o=out: f(a, o), array.reshape(HEIGHT, WIDTH, 3)))
+        if image is not None:
+            cases.append(('image', info['image'], image))
+            cases.append(('reference_image', reference[mode][1], image))
+        for kind, func, data in cases:
+            size = len(func(data))
+            durations = measure(lambda f=func, d=data: f(d), repeat)
+            results.append(result('convert', '%s_%d' % (kind, mode), durations, size, spi_hz,
+                                  mode=mode, function=func.__name__))
+    return results
+
+
+def bench_display(repeat, spi_hz):
+    """Benchmark `Display.draw_rgb_bytes` with list and array sources."""
+    results = []
+    frame = sample_frame()
+    sources = [('list', frame)]
+    if np is not None:
+        sources.append(('array', np.asarray(frame, dtype=np.uint8)))
+    with Counting() as io:
+        display = Display(io)
+        display.initialize(rotation=270)
+        for mode in colors.MODES:
+            display.set_color_mode(mode)
+            for source, data in sources:
+                io.reset_counters()
+                durations = measure(lambda d=data: display.draw_rgb_bytes(d), repeat)
+                results.append(result('display', 'draw_rgb_bytes_%s_%d' % (source, mode), durations,
+                                      io.spi_bytes // (repeat + 1), spi_hz, mode=mode))
+    return results
+
+
+def bench_buffered(repeat, spi_hz, regions=REGIONS):
+    """Benchmark `BufferedDisplay.update` and `update_partial` for several region sizes."""
+    from .buffered_display import BufferedDisplay  # pylint: disable=C0415
+    results = []
+    frame = sample_frame()
+    image = Image.new('RGB', (WIDTH, HEIGHT))
+    image.putdata(frame)
+    indexed = image.quantize(256)
+    buffers = [('pil', False, None)]
+    if np is not None:
+        buffers += [('numpy', True, None), ('palette', True, indexed.getpalette())]
+    for buffer_name, numpy_buffer, palette in buffers:
+        with Counting() as io:
+            display = BufferedDisplay(io, rotation=270, numpy_buffer=numpy_buffer, palette=palette)
+            display.buffer.paste(image if palette is None else indexed)
+            for mode in colors.MODES:
+                display.set_color_mode(mode)
+                io.reset_counters()
+                durations = measure(display.update, repeat)
+                results.append(result('buffered', 'update_%s_%d' % (buffer_name, mode), durations,
+                                      io.spi_bytes // (repeat + 1), spi_hz, mode=mode, buffer=buffer_name))
+                for width, height in regions:
+                    io.reset_counters()
+                    durations = measure(lambda w=width, h=height: display.update_partial(0, 0, w, h), repeat)
+                    results.append(result('buffered', 'update_partial_%dx%d_%s_%d' % (width, height, buffer_name, mode),
+                                          durations, io.spi_bytes // (repeat + 1), spi_hz,
+                                          mode=mode, buffer=buffer_name, region=[width, height]))
+    return results
+
+
+def metadata(spi_hz, repeat):
+    """Information about the benchmark environment."""
+    meta = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'numpy': np.__version__ if np is not None else None,
+        'pillow': None,
+        'spi_hz': spi_hz,
+        'repeat': repeat,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    if Image is not None:
+        import PIL  # pylint: disable=C0415
+        meta['pillow'] = PIL.__version__
+    return meta
+
+
+def compare(results, baseline, threshold):
+    """List results slower than in a baseline by more than `threshold` (ratio)."""
+    previous = {entry['name']: entry for entry in baseline['results']}
+    regressions = []
+    for entry in results:
+        old = previous.get(entry['name'])
+        if old and old['ms'] > 0 and entry['ms'] > old['ms'] * (1 + threshold):
+            regressions.append((entry['name'], old['ms'], entry['ms']))
+    return regressions
+
+
+def main(argv=None):
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(prog='python3 -m st7789v.benchmark', description=__doc__.splitlines()[0])
+    parser.add_argument('groups', nargs='*', metavar='GROUP',
+                        help='benchmark groups to run: convert, display, buffered (default: all)')
+    parser.add_argument('-n', '--repeat', type=int, default=10, help='measurements per benchmark (default: 10)')
+    parser.add_argument('--spi-hz', type=float, default=62.5e6, help='SPI clock to model transfers (default: 62.5 MHz)')
+    parser.add_argument('--json', metavar='FILE', help="write results as JSON to FILE ('-' for stdout)")
+    parser.add_argument('--compare', metavar='FILE', help='JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='slowdown ratio reported as a regression (default: 0.2)')
+    args = parser.parse_args(argv)
+
+    benches = {'convert': bench_converters, 'display': bench_display, 'buffered': bench_buffered}
+    groups = args.groups or ['convert', 'display', 'buffered']
+    for group in groups:
+        if group not in benches:
+            parser.error('unknown benchmark group %r' % group)
+    if Image is None and 'buffered' in groups:
+        groups.remove('buffered')
+        print('PIL is not installed, skipping BufferedDisplay benchmarks', file=sys.stderr)
+    results = []
+    for group in groups:
+        results.extend(benches[group](args.repeat, args.spi_hz))
+
+    output = sys.stderr if args.json == '-' else sys.stdout
+    print('%-40s %10s %10s %10s %10s' % ('benchmark', 'ms', 'bytes', 'MB/s', 'fps'), file=output)
+    for entry in results:
+        print('%-40s %10.3f %10d %10.1f %10.1f' % (entry['name'], entry['ms'], entry['bytes'],
+                                                   entry['mb_s'], entry['fps_model']), file=output)
+
+    report = {'meta': metadata(args.spi_hz, args.repeat), 'results': results}
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for name, old, new in regressions:
+            print('REGRESSION %s: %.3f ms -> %.3f ms' % (name, old, new), file=output)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
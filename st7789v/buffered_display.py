@@ -1,39 +1,156 @@
 """ST7789V display controller with an integrated buffer."""
 from PIL import Image, ImageDraw
+from . import damage
 from . import display
+from . import flusher
+from . import framebuffer
 
 class BufferedDisplay(display.Display):
     """ST7789V controller with a PIL image buffer."""
-    def __init__(self, io_wrapper, rotation=0, bounds=None, **kwargs):
+    def __init__(self, io_wrapper, rotation=0, bounds=None, numpy_buffer=False, palette=None, **kwargs):
+        """Initialize the display and create the buffer.
+
+        Args:
+            io_wrapper:     an IOWrapper implementation allowing IO/SPI control
+            rotation:       display rotation, see `Display.initialize`
+            bounds:         drawing region bounds, see `Display.initialize`
+            numpy_buffer:   Whether to back the buffer with a preallocated NumPy array.
+                            The buffer is then an RGBX image sharing memory with
+                            `array`, and updates do not allocate frame-sized objects.
+                            This saves allocations rather than time, conversions
+                            are not faster than from a PIL buffer.
+            palette:        Use an indexed-color ("P") buffer with this palette, as
+                            a flat sequence of R, G, B values of up to 256 colors.
+                            With `numpy_buffer`, `array` holds palette indices and
+                            updates only look up precomputed native bytes.
+            **kwargs:       width and height are passed to `Display`, other
+                            parameters to `Display.initialize`
+        """
         disp_kw = {k:v for k, v in kwargs.items() if k in ('width', 'height')}
         super().__init__(io_wrapper, **disp_kw)
-        self._init_kw = {k:v for k, v in kwargs.items() if k in ('color_mode', 'mirrored', 'inverted', 'reset')}
+        self._flusher = None
+        self._init_kw = {k:v for k, v in kwargs.items()
+                         if k in ('color_mode', 'mirrored', 'inverted', 'reset', 'dither')}
         self._init_kw['rotation'] = rotation
         self._init_kw['bounds'] = bounds
         super().initialize(**self._init_kw)
-        self.buffer = Image.new('RGB', (self.width, self.height))
+        if numpy_buffer and palette is not None:
+            self.framebuffer = framebuffer.PaletteBuffer(self.width, self.height, palette)
+            self.buffer = self.framebuffer.image
+            self.array = self.framebuffer.array
+        elif numpy_buffer:
+            self.framebuffer = framebuffer.FrameBuffer(self.width, self.height)
+            self.buffer = self.framebuffer.image
+            self.array = self.framebuffer.rgb
+        else:
+            self.framebuffer = None
+            self.buffer = Image.new('RGB' if palette is None else 'P', (self.width, self.height))
+            if palette is not None:
+                self.buffer.putpalette(palette)
+        self.damage = damage.DamageTracker(self.width, self.height, bytes_per_pixel=self.color_mode['bytes2'] / 2)
         self._draw = None
 
     def reset(self):
         super().reset()
         super().initialize(**{**self._init_kw, 'reset': False})
 
+    def start_async(self, buffers=2, policy=flusher.BLOCK):
+        """Send updates from a background thread.
+
+        `update()` and `update_partial()` then copy the buffer into one of the
+        back buffers and return immediately, while a worker thread converts
+        and sends it. Other commands, including raw commands, wait for pending
+        updates to be sent.
+        The worker is stopped when the IO wrapper is closed.
+
+        Args:
+            buffers:    total number of buffers, including `buffer` (at least 2)
+            policy:     What to do when all back buffers are in use: `block`
+                        until one is free, `drop` the oldest pending update or
+                        `coalesce` with the newest pending update. The last two
+                        need at least 3 buffers to avoid waiting.
+        """
+        if buffers < 2:
+            raise ValueError("Asynchronous updates need at least 2 buffers")
+        self.stop_async()
+        if self.framebuffer is not None:
+            back = [type(self.framebuffer)(self.buffer.width, self.buffer.height) for _ in range(buffers - 1)]
+        else:
+            back = [Image.new(self.buffer.mode, self.buffer.size) for _ in range(buffers - 1)]
+        self._flusher = flusher.Flusher(self._send, back, policy, self._merge_rects)
+        self._io.add_close_callback(self.stop_async)
+
+    def stop_async(self):
+        """Send pending updates and go back to synchronous updates."""
+        if self._flusher is None:
+            return
+        self._io.remove_close_callback(self.stop_async)
+        async_flusher, self._flusher = self._flusher, None
+        async_flusher.close()
+
+    def flush(self):
+        """Wait until all pending updates have been sent."""
+        if self._flusher is not None:
+            self._flusher.flush()
+
+    def command(self, name, data=None, read=True):
+        if self._flusher is not None and not self._flusher.in_worker():
+            self._flusher.flush()
+        return super().command(name, data, read)
+
+    def raw_command(self, cmd, data=None):
+        if self._flusher is not None and not self._flusher.in_worker():
+            self._flusher.flush()
+        super().raw_command(cmd, data)
+
     @property
     def draw(self):
-        """Get an ImageDraw object to draw to the buffer."""
+        """Get an ImageDraw proxy to draw to the buffer.
+
+        The proxy records the regions affected by each drawing call, so that
+        `update(damaged_only=True)` can send only those. It also provides a
+        `paste` method to paste images into the buffer.
+        """
         if self._draw is None:
-            self._draw = ImageDraw.Draw(self.buffer)
+            self._draw = damage.DamageDraw(ImageDraw.Draw(self.buffer), self.buffer, self.damage)
         return self._draw
 
+    def mark_damaged(self, left=0, top=0, right=None, bottom=None):
+        """Mark a region of the buffer as modified.
+
+        This is only needed when modifying `buffer` without using `draw`.
+        Without arguments, the whole buffer is marked as modified.
+
+        Args:
+            left:   left bound (included)
+            top:    top bound (included)
+            right:  right bound (excluded), defaults to the buffer width
+            bottom: bottom bound (excluded), defaults to the buffer height
+        """
+        right = self.buffer.width if right is None else right
+        bottom = self.buffer.height if bottom is None else bottom
+        self.damage.add((left, top, right, bottom))
+
     def set_color_mode(self, colmod):
         super().set_color_mode(colmod)
         self.pil_image_to_rgb = self.color_mode['image']
 
-    def update(self):
-        """Send the buffer's contents to the display."""
-        if self.bounds != (0, 0, self.max_w, self.max_h):
-            self.set_bounds(0, 0, self.max_w, self.max_h)
-        self.command('RAMWR', self.pil_image_to_rgb(self.buffer))
+    def update(self, damaged_only=False):
+        """Send the buffer's contents to the display.
+
+        Args:
+            damaged_only:   Only send the regions modified since the last update.
+                            Regions are merged, or replaced by a full update,
+                            when this is estimated to be faster.
+        """
+        rects = self.damage.plan(self.color_mode['bytes2'] / 2) if damaged_only else None
+        self.damage.clear()
+        if rects == []:
+            return
+        if self._flusher is not None:
+            self._flusher.submit(self._copy_to, rects)
+        else:
+            self._send(None, rects)
 
     def update_partial(self, left, top, right, bottom):
         """Performs a partial update of the display from the buffer.
@@ -44,9 +161,70 @@ class BufferedDisplay(display.Display):
             right:  right bound (excluded)
             bottom: bottom bound (excluded)
         """
-        if self.bounds != (left, top, right, bottom):
-            self.set_bounds(left, top, right, bottom)
-        self.command('RAMWR', self.pil_image_to_rgb(self.buffer.crop((left, top, right, bottom))))
+        if self._flusher is not None:
+            self._flusher.submit(self._copy_to, [(left, top, right, bottom)])
+        else:
+            self._send(None, [(left, top, right, bottom)])
+
+    def _send(self, source, rects):
+        """Send regions of a buffer to the display.
+
+        Args:
+            source: buffer to send, None for the current buffer
+            rects:  list of regions to send, None for the full buffer
+        """
+        instrument = self._instrument
+        start = instrument.clock() if instrument is not None else None
+        self._sync_frame()
+        self._gram_changed()
+        if rects is None:
+            self._write_window(0, 0, self.max_w, self.max_h,
+                               self._convert(source, 0, 0, self.buffer.width, self.buffer.height))
+        else:
+            with self.transaction():
+                for rect in rects:
+                    self._write_window(*rect, self._convert(source, *rect))
+        if instrument is not None:
+            instrument.frame(start)
+
+    def _convert(self, source, left, top, right, bottom):
+        """Convert a region of a buffer to the current color mode."""
+        instrument = self._instrument
+        start = instrument.clock() if instrument is not None else None
+        if source is None:
+            source = self.framebuffer if self.framebuffer is not None else self.buffer
+            if self.framebuffer is not None:
+                # back buffers are filled from the array by `_copy_to`, only the current one is drawn to
+                self.framebuffer.sync_from_image()
+        if isinstance(source, (framebuffer.FrameBuffer, framebuffer.PaletteBuffer)):
+            data = source.convert(self.color_mode, left, top, right, bottom, self.dither)
+        else:
+            if (left, top, right, bottom) != (0, 0, source.width, source.height):
+                source = source.crop((left, top, right, bottom))
+            data = self._dithered(source, left, top)
+            if data is None:
+                data = self.pil_image_to_rgb(source)
+        if instrument is not None:
+            instrument.convert(start, len(data))
+        return data
+
+    def _copy_to(self, target):
+        """Copy the current buffer to a back buffer."""
+        if self.framebuffer is not None:
+            self.framebuffer.sync_from_image()
+            target.array[...] = self.framebuffer.array
+            if isinstance(target, framebuffer.PaletteBuffer):
+                target.palette = self.framebuffer.palette
+        else:
+            target.paste(self.buffer)
+            if self.buffer.mode == 'P':
+                target.putpalette(self.buffer.getpalette())
+
+    def _merge_rects(self, old, new):
+        """Merge the regions of two updates, None meaning a full update."""
+        if old is None or new is None:
+            return None
+        return damage.CostModel(self.color_mode['bytes2'] / 2, self.damage.transaction_cost).merge(old + new)
 
     def update_partial_rect(self, x, y, width, height):
         """Performs a partial update of the display from the buffer.
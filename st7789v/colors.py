@@ -1,10 +1,11 @@
 """Define color manipulation functions."""
+import functools
 import itertools
-import numpy as np
-try:
-    NUMPY_AVAILABLE = True
-except ModuleNotFoundError:
-    NUMPY_AVAILABLE = False
+from . import lazy
+
+# NumPy is only loaded when a NumPy converter is first used
+np = lazy.optional_import('numpy')
+NUMPY_AVAILABLE = np is not None
 
 
 def bytes_to_rgb_444(image_data):
@@ -71,9 +72,301 @@ def bytes_to_rgb_666_np(image_data):
     return image.flatten().tobytes()
 
 
+def _out_array(out, size, shape):
+    """Get a uint8 array of `size` bytes viewing `out`, allocating it if needed."""
+    if out is None:
+        out = bytearray(size)
+    return out, np.frombuffer(out, dtype=np.uint8, count=size).reshape(shape)
+
+
+def _scratch_array(scratch, size, shape):
+    """Get a uint8 array of `size` bytes viewing `scratch`, allocating it if needed."""
+    if scratch is None:
+        return np.empty(shape, dtype=np.uint8)
+    return scratch.reshape(-1)[:size].reshape(shape)
+
+
+def copy_rgb(target, source):
+    """Copy RGB values between arrays of the same shape (..., 3).
+
+    Channels are copied one by one, which is several times faster than
+    copying pixels of 3 bytes when either array is strided, e.g. RGBX.
+    """
+    for channel in range(3):
+        np.copyto(target[..., channel], source[..., channel])
+
+
+def array_to_rgb_444_np(array, out=None, scratch=None):
+    """Convert an array of RGB values to RGB 4-4-4 bytes using numpy.
+
+    Args:
+        array:      uint8 array of shape (N, 3)
+        out:        optional writable buffer of at least (3N+1)/2 bytes
+        scratch:    optional contiguous uint8 array of at least N/2+1 bytes
+
+    Returns:
+        A memoryview of the converted bytes.
+    """
+    count = len(array)
+    pairs = (count + 1) // 2
+    out, result = _out_array(out, pairs * 3, (pairs, 3))
+    tmp = _scratch_array(scratch, pairs, (pairs,))
+    even, odd = array[0::2], array[1::2]
+    np.bitwise_and(even[:, 0], 0xf0, out=result[:, 0])
+    np.right_shift(even[:, 1], 4, out=tmp)
+    np.bitwise_or(result[:, 0], tmp, out=result[:, 0])
+    np.bitwise_and(even[:, 2], 0xf0, out=result[:, 1])
+    if count % 2:
+        # odd number of pixels, the last 4 bits are ignored by the display
+        result[-1, 2] = 0
+        result, tmp, odd = result[:-1], tmp[:-1], odd[:pairs-1]
+    np.right_shift(odd[:, 0], 4, out=tmp)
+    np.bitwise_or(result[:, 1], tmp, out=result[:, 1])
+    np.bitwise_and(odd[:, 1], 0xf0, out=result[:, 2])
+    np.right_shift(odd[:, 2], 4, out=tmp)
+    np.bitwise_or(result[:, 2], tmp, out=result[:, 2])
+    return memoryview(out)[:(count * 3 + 1) // 2]
+
+
+def array_to_rgb_565_np(array, out=None, scratch=None):
+    """Convert an array of RGB values to RGB 5-6-5 bytes using numpy.
+
+    Args:
+        array:      uint8 array of shape (..., 3)
+        out:        optional writable buffer of at least 2 bytes per pixel
+        scratch:    optional contiguous uint8 array of at least 1 byte per pixel
+
+    Returns:
+        A memoryview of the converted bytes.
+    """
+    shape = array.shape[:-1]
+    count = array.size // 3
+    out, result = _out_array(out, count * 2, shape + (2,))
+    tmp = _scratch_array(scratch, count, shape)
+    high, low = result[..., 0], result[..., 1]
+    np.bitwise_and(array[..., 0], 0xf8, out=high)
+    np.right_shift(array[..., 1], 5, out=tmp)
+    np.bitwise_or(high, tmp, out=high)
+    np.left_shift(array[..., 1], 3, out=low)
+    np.bitwise_and(low, 0xe0, out=low)
+    np.right_shift(array[..., 2], 3, out=tmp)
+    np.bitwise_or(low, tmp, out=low)
+    return memoryview(out)[:count * 2]
+
+
+def array_to_rgb_666_np(array, out=None, scratch=None):  # pylint: disable=W0613
+    """Convert an array of RGB values to RGB 6-6-6 bytes using numpy.
+
+    Args:
+        array:      uint8 array of shape (..., 3)
+        out:        optional writable buffer of at least 3 bytes per pixel
+        scratch:    unused, for consistency with other array converters
+
+    Returns:
+        A memoryview of the converted bytes.
+    """
+    count = array.size // 3
+    out, result = _out_array(out, count * 3, array.shape)
+    copy_rgb(result, array)
+    return memoryview(out)[:count * 3]
+
+
+# Size of the Bayer matrix used for ordered dithering, enough levels for 4-bit channels
+DITHER_SIZE = 4
+# Tiled dithering offsets, by (step, size), grown as needed
+_DITHER_MAPS = {}
+
+
+@functools.lru_cache(maxsize=None)
+def bayer_matrix(size=DITHER_SIZE):
+    """Get a Bayer threshold matrix.
+
+    Args:
+        size:   matrix size, a power of 2
+
+    Returns:
+        An int array of shape (size, size) holding each value from 0 to size²-1.
+    """
+    matrix = np.zeros((1, 1), dtype=np.int64)
+    while len(matrix) < size:
+        matrix = np.block([[4 * matrix, 4 * matrix + 2], [4 * matrix + 3, 4 * matrix + 1]])
+    return matrix
+
+
+def _dither_map(step, shape, left, top, size=DITHER_SIZE):
+    """Ordered dithering offsets for a region, from 0 to `step` - 1.
+
+    The pattern is aligned on (0, 0), so that regions drawn separately match.
+    """
+    height, width = shape
+    left, top = left % size, top % size
+    offsets = _DITHER_MAPS.get((step, size))
+    if offsets is None or offsets.shape[0] < top + height or offsets.shape[1] < left + width:
+        # room for any alignment, so that it is not grown again for the same size
+        rows = max(height + size, offsets.shape[0] if offsets is not None else 0)
+        cols = max(width + size, offsets.shape[1] if offsets is not None else 0)
+        matrix = (bayer_matrix(size) * step // (size * size)).astype(np.uint8)
+        offsets = _DITHER_MAPS[(step, size)] = np.tile(matrix, (-(-rows // size), -(-cols // size)))
+    return offsets[top:top + height, left:left + width]
+
+
+def _dither_channel(channel, bits, left, top, out):
+    """Ordered dithering of a channel to `bits` bits, the level of each value being its top bits.
+
+    Values are scaled as v - v >> bits, so that levels are evenly spread over
+    0-255 as on the panel (e.g. 17 apart for 4 bits), and the offsets act as
+    thresholds centered between levels, so that dithering does not shift the
+    average. Everything is computed in `out`, in uint8 without overflow.
+    """
+    np.right_shift(channel, bits, out=out)
+    np.subtract(channel, out, out=out)
+    np.add(out, _dither_map(256 >> bits, channel.shape, left, top), out=out)
+    return out
+
+
+def array_to_rgb_444_dither_np(array, out=None, scratch=None, left=0, top=0):
+    """Convert an array of RGB values to RGB 4-4-4 bytes with ordered dithering, using numpy.
+
+    Dithering is done channel by channel while packing, without an intermediate frame.
+
+    Args:
+        array:      uint8 array of shape (H, W, 3)
+        out:        optional writable buffer of at least (3HW+1)/2 bytes
+        scratch:    optional contiguous uint8 array of at least 1.5HW+1 bytes
+        left:       horizontal position of the array, to align the pattern
+        top:        vertical position of the array, to align the pattern
+
+    Returns:
+        A memoryview of the converted bytes.
+    """
+    shape = array.shape[:-1]
+    count = array.size // 3
+    pairs = (count + 1) // 2
+    out, result = _out_array(out, pairs * 3, (pairs, 3))
+    buffer = _scratch_array(scratch, count + pairs, (count + pairs,))
+    value, tmp = buffer[:count], buffer[count:]
+    even, odd = value[0::2], value[1::2]
+    if count % 2:
+        # odd number of pixels, the last 4 bits are ignored by the display
+        result[-1, 1:] = 0
+    # pixels are packed in pairs as R0G0 B0R1 G1B1, the odd pixel of the last pair may be missing
+    paired = result[:len(odd)]
+    _dither_channel(array[..., 0], 4, left, top, value.reshape(shape))
+    np.bitwise_and(even, 0xf0, out=result[:, 0])
+    np.right_shift(odd, 4, out=paired[:, 1])
+    _dither_channel(array[..., 1], 4, left, top, value.reshape(shape))
+    np.right_shift(even, 4, out=tmp)
+    np.bitwise_or(result[:, 0], tmp, out=result[:, 0])
+    np.bitwise_and(odd, 0xf0, out=paired[:, 2])
+    _dither_channel(array[..., 2], 4, left, top, value.reshape(shape))
+    np.bitwise_and(even, 0xf0, out=tmp)
+    np.bitwise_or(result[:, 1], tmp, out=result[:, 1])
+    tmp = tmp[:len(odd)]
+    np.right_shift(odd, 4, out=tmp)
+    np.bitwise_or(paired[:, 2], tmp, out=paired[:, 2])
+    return memoryview(out)[:(count * 3 + 1) // 2]
+
+
+def array_to_rgb_565_dither_np(array, out=None, scratch=None, left=0, top=0):
+    """Convert an array of RGB values to RGB 5-6-5 bytes with ordered dithering, using numpy.
+
+    Dithering is done channel by channel while packing, without an intermediate frame.
+
+    Args:
+        array:      uint8 array of shape (H, W, 3)
+        out:        optional writable buffer of at least 2 bytes per pixel
+        scratch:    optional contiguous uint8 array of at least 2 bytes per pixel
+        left:       horizontal position of the array, to align the pattern
+        top:        vertical position of the array, to align the pattern
+
+    Returns:
+        A memoryview of the converted bytes.
+    """
+    shape = array.shape[:-1]
+    count = array.size // 3
+    out, result = _out_array(out, count * 2, shape + (2,))
+    tmp, value = _scratch_array(scratch, count * 2, (2,) + shape)
+    high, low = result[..., 0], result[..., 1]
+    np.bitwise_and(_dither_channel(array[..., 0], 5, left, top, value), 0xf8, out=high)
+    _dither_channel(array[..., 1], 6, left, top, value)
+    np.right_shift(value, 5, out=tmp)
+    np.bitwise_or(high, tmp, out=high)
+    np.left_shift(value, 3, out=low)
+    np.bitwise_and(low, 0xe0, out=low)
+    np.right_shift(_dither_channel(array[..., 2], 5, left, top, value), 3, out=tmp)
+    np.bitwise_or(low, tmp, out=low)
+    return memoryview(out)[:count * 2]
+
+
+def palette_lut(palette, color_mode):
+    """Convert a palette to a table of native bytes for a color mode, using numpy.
+
+    Args:
+        palette:    flat sequence of R, G, B values of up to 256 colors, as
+                    returned by PIL's `Image.getpalette`
+        color_mode: color mode description, from `MODES`
+
+    Returns:
+        A uint8 array holding the bytes of each palette index, of shape (256, 2)
+        or (256, 3). As RGB 4-4-4 packs pixels in pairs, its table holds the 3
+        bytes of each of the 65536 pairs of indices instead.
+    """
+    rgb = np.zeros((256, 3), dtype=np.uint8)
+    values = np.frombuffer(bytes(palette[:768]), dtype=np.uint8)
+    rgb.reshape(-1)[:len(values)] = values
+    if color_mode['bytes2'] % 2:
+        pairs = np.empty((256, 256, 2, 3), dtype=np.uint8)
+        pairs[:, :, 0] = rgb[:, np.newaxis]
+        pairs[:, :, 1] = rgb[np.newaxis, :]
+        return np.frombuffer(array_to_rgb_444_np(pairs.reshape(-1, 3)), dtype=np.uint8).reshape(-1, 3)
+    size = color_mode['bytes2'] // 2
+    return np.frombuffer(color_mode['array'](rgb), dtype=np.uint8).reshape(256, size)
+
+
+def indices_to_native_np(indices, lut, out=None, scratch=None):
+    """Convert an array of palette indices to native bytes using numpy.
+
+    Args:
+        indices:    uint8 array of palette indices, flat for RGB 4-4-4
+        lut:        table from `palette_lut`
+        out:        optional writable buffer large enough for the converted bytes
+        scratch:    optional contiguous uint8 array of at least N+2 bytes,
+                    only used for RGB 4-4-4
+
+    Returns:
+        A memoryview of the converted bytes.
+    """
+    count = indices.size
+    if len(lut) == 256:
+        size = lut.shape[1]
+        out, result = _out_array(out, count * size, indices.shape + (size,))
+        np.take(lut, indices, axis=0, out=result, mode='clip')
+        return memoryview(out)[:count * size]
+    pairs = (count + 1) // 2
+    out, result = _out_array(out, pairs * 3, (pairs, 3))
+    if scratch is None:
+        index = np.empty(pairs, dtype=np.uint16)
+    else:
+        index = scratch.reshape(-1)[:pairs * 2].view(np.uint16)
+    # index of each pair of pixels in the table: first index * 256 + second index
+    index[:] = indices[0::2]
+    np.left_shift(index, 8, out=index)
+    np.bitwise_or(index[:count // 2], indices[1::2], out=index[:count // 2])
+    np.take(lut, index, axis=0, out=result, mode='clip')
+    if count % 2:
+        # odd number of pixels, clear the bits of the missing pixel
+        result[-1, 1] &= 0xf0
+        result[-1, 2] = 0
+    return memoryview(out)[:(count * 3 + 1) // 2]
+
+
 def image_to_rgb_444(image):
     """Convert PIL image to RGB 4-4-4."""
-    return bytes.fromhex(image.tobytes().hex()[::2])
+    data = image.tobytes().hex()[::2]
+    if len(data) % 2:
+        # odd number of pixels, the last 4 bits are ignored by the display
+        data += '0'
+    return bytes.fromhex(data)
 
 
 def image_to_rgb_565(image):
@@ -86,31 +379,74 @@ def image_to_rgb_666(image):
     return image.tobytes()
 
 
-# COLMOD mode ID, bytes per 2 pixels, converter func
+def _rgb_image(image):
+    """Make sure a PIL image is in RGB mode."""
+    return image if image.mode == 'RGB' else image.convert('RGB')
+
+
+def image_to_rgb_444_np(image):
+    """Convert PIL image to RGB 4-4-4 using numpy."""
+    return array_to_rgb_444_np(np.asarray(_rgb_image(image)).reshape(-1, 3))
+
+
+def image_to_rgb_565_np(image):
+    """Convert PIL image to RGB 5-6-5 using numpy."""
+    return array_to_rgb_565_np(np.asarray(_rgb_image(image)))
+
+
+def image_to_rgb_666_np(image):
+    """Convert PIL image to RGB 6-6-6 using numpy."""
+    return _rgb_image(image).tobytes()
+
+
+# maps each byte to the hex digit of its 4 highest bits
+_HIGH_NIBBLE_HEX = bytes(b'0123456789abcdef'[i >> 4] for i in range(256))
+
+
+def image_to_rgb_444_pil(image):
+    """Convert PIL image to RGB 4-4-4 without numpy."""
+    data = _rgb_image(image).tobytes().translate(_HIGH_NIBBLE_HEX)
+    if len(data) % 2:
+        # odd number of pixels, the last 4 bits are ignored by the display
+        data += b'0'
+    return bytes.fromhex(data.decode('ascii'))
+
+
+# lookup tables for the bits of each channel in the high and low RGB 5-6-5 bytes
+_565_RED_HIGH = [i & 0xf8 for i in range(256)]
+_565_GREEN_HIGH = [i >> 5 for i in range(256)]
+_565_GREEN_LOW = [i << 3 & 0xe0 for i in range(256)]
+_565_BLUE_LOW = [i >> 3 for i in range(256)]
+
+
+def image_to_rgb_565_pil(image):
+    """Convert PIL image to RGB 5-6-5 without numpy, using PIL channel operations."""
+    from PIL import Image, ImageChops  # pylint: disable=C0415
+    red, green, blue = _rgb_image(image).split()
+    high = ImageChops.add(red.point(_565_RED_HIGH), green.point(_565_GREEN_HIGH))
+    low = ImageChops.add(green.point(_565_GREEN_LOW), blue.point(_565_BLUE_LOW))
+    # LA images are stored as interleaved pairs of bytes
+    return Image.merge('LA', (high, low)).tobytes()
+
+
+def image_to_rgb_666_pil(image):
+    """Convert PIL image to RGB 6-6-6 without numpy."""
+    return _rgb_image(image).tobytes()
+
+
+# COLMOD mode ID, bytes per 2 pixels, converter func, PIL image, in-place array
+# and in-place dithering array converters
 MODES = {
-    444: {'id': 0x03, 'bytes2': 3, 'func': bytes_to_rgb_444_np if NUMPY_AVAILABLE else bytes_to_rgb_444, 'image': image_to_rgb_444},
-    565: {'id': 0x05, 'bytes2': 4, 'func': bytes_to_rgb_565_np if NUMPY_AVAILABLE else bytes_to_rgb_565, 'image': image_to_rgb_565},
-    666: {'id': 0x06, 'bytes2': 6, 'func': bytes_to_rgb_666_np if NUMPY_AVAILABLE else bytes_to_rgb_666, 'image': image_to_rgb_666},
+    444: {'id': 0x03, 'bytes2': 3, 'func': bytes_to_rgb_444_np if NUMPY_AVAILABLE else bytes_to_rgb_444,
+          'image': image_to_rgb_444_np if NUMPY_AVAILABLE else image_to_rgb_444_pil,
+          'array': array_to_rgb_444_np if NUMPY_AVAILABLE else None,
+          'dither': array_to_rgb_444_dither_np if NUMPY_AVAILABLE else None},
+    565: {'id': 0x05, 'bytes2': 4, 'func': bytes_to_rgb_565_np if NUMPY_AVAILABLE else bytes_to_rgb_565,
+          'image': image_to_rgb_565_np if NUMPY_AVAILABLE else image_to_rgb_565_pil,
+          'array': array_to_rgb_565_np if NUMPY_AVAILABLE else None,
+          'dither': array_to_rgb_565_dither_np if NUMPY_AVAILABLE else None},
+    666: {'id': 0x06, 'bytes2': 6, 'func': bytes_to_rgb_666_np if NUMPY_AVAILABLE else bytes_to_rgb_666,
+          'image': image_to_rgb_666_np if NUMPY_AVAILABLE else image_to_rgb_666_pil,
+          'array': array_to_rgb_666_np if NUMPY_AVAILABLE else None,
+          'dither': None},
 }
-
-if __name__ == "__main__":
-    import random
-    import timeit
-    from PIL import Image
-    sample_image = Image.new('RGB', (240, 320))
-    for y in range(320):
-        for x in range(240):
-            sample_image.putpixel((x, y), (random.randint(0, 255),
-                                           random.randint(0, 255), random.randint(0, 255)))
-    sample = list(sample_image.getdata())
-
-    for func, n in ((bytes_to_rgb_444, 20), (bytes_to_rgb_565, 20), (bytes_to_rgb_666, 200),
-                    (bytes_to_rgb_444_np, 20), (bytes_to_rgb_565_np, 20), (bytes_to_rgb_666_np, 20)):
-        print('Calling %s %d times:' % (func.__name__, n))
-        res = timeit.timeit(lambda f=func: f(sample), number=n)
-        print('Total time: %03g\tTime per iter: %03g' % (res, res/n))
-
-    for func, n in ((image_to_rgb_444, 1000), (image_to_rgb_565, 20), (image_to_rgb_666, 1000)):
-        print('Calling %s %d times:' % (func.__name__, n))
-        res = timeit.timeit(lambda f=func: f(sample_image), number=n)
-        print('Total time: %03g\tTime per iter: %03g' % (res, res/n))
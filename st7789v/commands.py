@@ -61,3 +61,34 @@ by_id = {
     id: {'name': name, 'wrx': wrx, 'rdx': rdx, 'desc': desc}
     for id, name, wrx, rdx, desc in commands
 }
+
+
+class Command:
+    """Precompiled command description, see `compiled`."""
+    __slots__ = ('id', 'name', 'wrx', 'rdx', 'desc', 'header', 'shadow')
+
+    def __init__(self, id, name, wrx, rdx, desc):  # pylint: disable=W0622
+        self.id = id
+        self.name = name
+        self.wrx = wrx
+        self.rdx = rdx
+        self.desc = desc
+        self.header = bytes([id])
+        self.shadow = SHADOWED.get(id)
+
+    def __repr__(self):
+        return '<Command %02Xh %s>' % (self.id, self.name)
+
+
+# Registers whose last written value is remembered to avoid writing it again,
+# by command ID; INVON and INVOFF share the same state
+SHADOWED = {0x20: 'INV', 0x21: 'INV', 0x2A: 'CASET', 0x2B: 'RASET', 0x36: 'MADCTL', 0x3A: 'COLMOD'}
+
+# Command objects by name, both upper and lower case
+compiled = {}
+for _command in commands:
+    compiled[_command[1]] = compiled[_command[1].lower()] = Command(*_command)
+del _command
+
+# 1-byte headers for raw commands, by ID
+headers = [bytes([i]) for i in range(256)]
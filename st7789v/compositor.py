@@ -0,0 +1,284 @@
+"""Layers composed into the buffer of a `BufferedDisplay`."""
+from PIL import Image, ImageChops, ImageDraw
+from . import damage
+from . import sprite
+
+
+class Layer:
+    """Image placed on the screen by a `Compositor`, created with `Compositor.add`.
+
+    Changing the position, order or visibility of a layer only damages its
+    footprint; drawing to it with `draw` only damages the regions drawn.
+    The layer's converted bytes are cached, so regions fully covered by an
+    opaque layer whose content did not change are sent without converting
+    them again, e.g. when an overlay moves over a static background.
+    """
+
+    def __init__(self, compositor, image, x, y, z, visible, colorkey):
+        self._compositor = compositor
+        self._image = image
+        self._x, self._y, self._z = x, y, z
+        self._visible = visible
+        self._colorkey = colorkey
+        self._sprite = sprite.Sprite(image)
+        self._mask = None
+        self._tracker = damage.DamageTracker(image.width, image.height,
+                                             bytes_per_pixel=compositor.damage.bytes_per_pixel)
+        self._draw = None
+        self._changed = True
+
+    @property
+    def image(self):
+        """PIL image of the layer, "RGBA" images are blended with their alpha channel."""
+        return self._image
+
+    @image.setter
+    def image(self, image):
+        self._damage_footprint()
+        self._image = image
+        self._sprite = sprite.Sprite(image)
+        self._tracker = damage.DamageTracker(image.width, image.height,
+                                             bytes_per_pixel=self._compositor.damage.bytes_per_pixel)
+        self._draw = None
+        self._content_changed()
+        self._damage_footprint()
+
+    @property
+    def x(self):
+        """Horizontal position of the left side, may be negative."""
+        return self._x
+
+    @property
+    def y(self):
+        """Vertical position of the top side, may be negative."""
+        return self._y
+
+    @property
+    def z(self):
+        """Stacking order, layers with a greater `z` are drawn on top."""
+        return self._z
+
+    @z.setter
+    def z(self, z):
+        self._z = z
+        self._compositor._sort()  # pylint: disable=W0212
+        self._damage_footprint()
+
+    @property
+    def visible(self):
+        """Whether the layer is shown."""
+        return self._visible
+
+    @visible.setter
+    def visible(self, visible):
+        if visible != self._visible:
+            self._visible = visible
+            self._compositor.damage.add(self.footprint)
+
+    @property
+    def colorkey(self):
+        """(R, G, B) color drawn as transparent, None if all colors are drawn."""
+        return self._colorkey
+
+    @colorkey.setter
+    def colorkey(self, colorkey):
+        self._colorkey = None if colorkey is None else tuple(colorkey[:3])
+        self._mask = None
+        self._content_changed()
+        self._damage_footprint()
+
+    @property
+    def footprint(self):
+        """Region covered by the layer on the screen, as (left, top, right, bottom)."""
+        return (self._x, self._y, self._x + self._image.width, self._y + self._image.height)
+
+    @property
+    def opaque(self):
+        """Whether the layer hides everything under its footprint."""
+        return self._colorkey is None and 'A' not in self._image.mode
+
+    @property
+    def draw(self):
+        """Get an ImageDraw proxy to draw to the layer, see `BufferedDisplay.draw`."""
+        if self._draw is None:
+            self._draw = damage.DamageDraw(ImageDraw.Draw(self._image), self._image, self._tracker)
+        return self._draw
+
+    def move(self, x, y):
+        """Move the layer, damaging its old and new footprints."""
+        if (x, y) == (self._x, self._y):
+            return
+        self._damage_footprint()
+        self._x, self._y = x, y
+        self._damage_footprint()
+
+    def mark_damaged(self, left=0, top=0, right=None, bottom=None):
+        """Mark a region of the layer as modified, in layer coordinates.
+
+        This is only needed when modifying `image` without using `draw`.
+        Without arguments, the whole layer is marked as modified.
+        """
+        right = self._image.width if right is None else right
+        bottom = self._image.height if bottom is None else bottom
+        self._tracker.add((left, top, right, bottom))
+
+    def _damage_footprint(self):
+        if self._visible:
+            self._compositor.damage.add(self.footprint)
+
+    def _content_changed(self):
+        self._sprite.invalidate()
+        self._mask = None
+        self._changed = True
+
+    def _collect(self):
+        """Report regions drawn to since the last update to the compositor.
+
+        Returns:
+            Whether the content of the layer changed since the last update.
+        """
+        if self._tracker:
+            if self._visible:
+                for left, top, right, bottom in self._tracker.rects:
+                    self._compositor.damage.add((left + self._x, top + self._y, right + self._x, bottom + self._y))
+            self._tracker.clear()
+            self._content_changed()
+        changed, self._changed = self._changed, False
+        return changed
+
+    def _layer_mask(self):
+        """Get the "L" mask of the drawn pixels, None if the layer is opaque."""
+        if self.opaque:
+            return None
+        if self._mask is None:
+            mask = self._image.getchannel('A') if 'A' in self._image.mode else None
+            if self._colorkey is not None:
+                difference = ImageChops.difference(self._image.convert('RGB'),
+                                                   Image.new('RGB', self._image.size, self._colorkey))
+                red, green, blue = difference.split()
+                keyed = ImageChops.lighter(ImageChops.lighter(red, green), blue).point(lambda v: 255 if v else 0)
+                mask = keyed if mask is None else ImageChops.multiply(mask, keyed)
+            self._mask = mask
+        return self._mask
+
+    def _paste(self, target, left, top, right, bottom, origin):
+        """Draw the part of the layer inside a screen region onto an image at `origin`."""
+        box = (max(left, self._x) - self._x, max(top, self._y) - self._y,
+               min(right, self._x + self._image.width) - self._x, min(bottom, self._y + self._image.height) - self._y)
+        position = (box[0] + self._x - origin[0], box[1] + self._y - origin[1])
+        region = self._image.crop(box)
+        if region.mode != 'RGB':
+            region = region.convert('RGB')
+        mask = self._layer_mask()
+        target.paste(region, position, None if mask is None else mask.crop(box))
+
+
+class Compositor:
+    """Compose z-ordered layers into a `BufferedDisplay` and send the regions which changed.
+
+    Layers are composed bottom to top over black, "RGBA" layers being blended
+    with their alpha channel and pixels of a layer's `colorkey` being left out.
+    The display's `buffer` holds the composed screen after each `update`.
+    """
+
+    def __init__(self, display):
+        """Create an empty compositor.
+
+        Args:
+            display:    `BufferedDisplay` to compose into, with an RGB buffer
+        """
+        if display.buffer.mode == 'P':
+            raise ValueError("Layers cannot be composed into a palette buffer")
+        self.display = display
+        self.damage = damage.DamageTracker(display.buffer.width, display.buffer.height,
+                                           bytes_per_pixel=display.color_mode['bytes2'] / 2)
+        self.damage.add_all()
+        self._layers = []
+        self._order = 0
+
+    @property
+    def layers(self):
+        """List of layers, from bottom to top."""
+        return [layer for _, layer in self._layers]
+
+    def add(self, image, x=0, y=0, z=0, visible=True, colorkey=None):
+        """Add a layer on top of the layers with the same `z`.
+
+        Args:
+            image:      PIL image of the layer, drawn to with `Layer.draw`
+            x:          horizontal position of the left side, may be negative
+            y:          vertical position of the top side, may be negative
+            z:          stacking order, layers with a greater `z` are drawn on top
+            visible:    whether the layer is shown
+            colorkey:   (R, G, B) color drawn as transparent
+
+        Returns:
+            The new `Layer`.
+        """
+        layer = Layer(self, image, x, y, z, visible, None if colorkey is None else tuple(colorkey[:3]))
+        self._order += 1
+        self._layers.append((self._order, layer))
+        self._sort()
+        layer._damage_footprint()  # pylint: disable=W0212
+        return layer
+
+    def remove(self, layer):
+        """Remove a layer, damaging its footprint."""
+        layer._damage_footprint()  # pylint: disable=W0212
+        self._layers = [entry for entry in self._layers if entry[1] is not layer]
+
+    def _sort(self):
+        self._layers.sort(key=lambda entry: (entry[1].z, entry[0]))
+
+    def update(self):
+        """Compose and send the damaged regions of the screen.
+
+        Returns:
+            The list of (left, top, right, bottom) regions sent.
+        """
+        changed = [layer for layer in self.layers if layer._collect()]  # pylint: disable=W0212
+        rects = self.damage.plan(self.display.color_mode['bytes2'] / 2)
+        self.damage.clear()
+        if not rects:
+            return []
+        # pylint: disable=W0212
+        display = self.display
+        regions = [(rect, self._compose(rect, changed)) for rect in rects]
+        instrument = display._instrument
+        start = instrument.clock() if instrument is not None else None
+        display._sync_frame()
+        display._gram_changed()
+        with display.transaction():
+            for rect, data in regions:
+                display._write_window(*rect, data if data is not None else display._convert(None, *rect))
+        if instrument is not None:
+            instrument.frame(start)
+        return rects
+
+    def _compose(self, rect, changed):
+        """Compose a region into the display's buffer.
+
+        Returns:
+            The region's bytes in the display's color mode if they could be
+            taken from the cache of an opaque layer covering it, else None.
+        """
+        left, top, right, bottom = rect
+        layers = [layer for layer in self.layers if layer.visible and damage.rect_intersects(layer.footprint, rect)]
+        top_layer = layers[-1] if layers else None
+        if top_layer is not None and top_layer.opaque and top_layer not in changed:
+            x, y, x_end, y_end = top_layer.footprint
+            if x <= left and y <= top and right <= x_end and bottom <= y_end:
+                try:
+                    data = self.display._clip_native(  # pylint: disable=W0212
+                        top_layer._sprite.native(self.display),  # pylint: disable=W0212
+                        top_layer.image.width, top_layer.image.height, left - x, top - y, right - x, bottom - y)
+                except ValueError:
+                    data = None
+                if data is not None:
+                    top_layer._paste(self.display.buffer, *rect, (0, 0))  # pylint: disable=W0212
+                    return data
+        region = Image.new('RGB', (right - left, bottom - top))
+        for layer in layers:
+            layer._paste(region, *rect, (left, top))  # pylint: disable=W0212
+        self.display.buffer.paste(region, (left, top))
+        return None
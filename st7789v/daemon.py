@@ -0,0 +1,306 @@
+"""Shared framebuffer, drawn to by several processes and sent by a daemon.
+
+The daemon owns the display and maps a framebuffer file, which client
+processes map as well and write RGB pixels to directly. Clients then report
+the regions they changed on a Unix datagram socket; the daemon merges them
+(see `damage.CostModel`) and sends them at most `fps` times per second.
+
+Run with `python3 -m st7789v.daemon`, see `--help` for options.
+
+The framebuffer file starts with a header (see `HEADER`), followed at
+`HEADER_SIZE` by rows of 8-bit R, G, B values covering the whole screen.
+Damage messages are sequences of (left, top, right, bottom) rectangles
+packed as `DAMAGE`, an empty message damaging the whole screen.
+"""
+import argparse
+import logging
+import mmap
+import os
+import select
+import socket
+import struct
+import threading
+import time
+from . import damage
+from . import lazy
+
+np = lazy.optional_import('numpy')
+
+# Default framebuffer file, the damage socket is the same path with `.sock` appended
+DEFAULT_PATH = '/dev/shm/st7789v.fb' if os.path.isdir('/dev/shm') else '/tmp/st7789v.fb'
+MAGIC = b'S7FB'
+VERSION = 1
+# magic, version, width, height, bytes per row
+HEADER = struct.Struct('<4sHHHH')
+HEADER_SIZE = 64
+# left, top, right, bottom
+DAMAGE = struct.Struct('<HHHH')
+# Largest damage message, in bytes
+MAX_MESSAGE = 64 * DAMAGE.size
+# Maximum time between checks for `stop`, in seconds
+POLL_INTERVAL = 0.1
+
+
+def _socket_path(path, socket_path):
+    return socket_path or path + '.sock'
+
+
+class FramebufferDaemon:
+    """Send the damaged regions of a shared framebuffer to a display."""
+
+    def __init__(self, display, path=DEFAULT_PATH, socket_path=None, fps=30):
+        """Define the shared framebuffer, call `open` to create it.
+
+        Args:
+            display:        initialized `Display`, the framebuffer covers its whole screen
+            path:           framebuffer file, preferably on a tmpfs such as /dev/shm
+            socket_path:    damage socket, defaults to `path` followed by `.sock`
+            fps:            maximum number of updates per second, None for no limit
+        """
+        self.display = display
+        self.width = display.max_w
+        self.height = display.max_h
+        self.path = path
+        self.socket_path = _socket_path(path, socket_path)
+        self.fps = fps
+        self.updates = 0
+        self.log = logging.getLogger(__name__)
+        self._tracker = damage.DamageTracker(self.width, self.height,
+                                             bytes_per_pixel=display.color_mode['bytes2'] / 2)
+        self._map = None
+        self._array = None
+        self._image = None
+        self._socket = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_trace):
+        self.close()
+
+    def open(self):
+        """Create the framebuffer file, cleared to black, and bind the damage socket."""
+        stride = self.width * 3
+        size = HEADER_SIZE + stride * self.height
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o666)
+        try:
+            os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self._map[:HEADER.size] = HEADER.pack(MAGIC, VERSION, self.width, self.height, stride)
+        if np is not None:
+            self._array = np.frombuffer(self._map, np.uint8, stride * self.height, HEADER_SIZE)
+            self._array = self._array.reshape(self.height, self.width, 3)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(self.socket_path)
+        self._tracker.add_all()
+        return self
+
+    def close(self):
+        """Stop serving, then remove the framebuffer file and the damage socket."""
+        self.stop()
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+            os.remove(self.socket_path)
+        if self._map is not None:
+            self._array = self._image = None
+            self._map.close()
+            self._map = None
+            os.remove(self.path)
+
+    def start(self):
+        """Serve clients in a background thread."""
+        if self._thread is not None:
+            raise RuntimeError("The daemon is already running")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.serve, name='st7789v-daemon', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving, after `start` or from another thread than `serve`."""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+            self._thread = None
+
+    def serve(self):
+        """Receive damage and update the display until `stop` is called.
+
+        Errors raised by an update are logged and its regions are dropped, so
+        a bad region or a transient bus error does not stop the daemon.
+        """
+        interval = 1 / self.fps if self.fps else 0
+        next_update = 0
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if self._tracker and now >= next_update:
+                try:
+                    self.update()
+                except Exception:  # pylint: disable=W0703
+                    self.log.exception("Failed to update the display")
+                next_update = now + interval
+                continue
+            # damage arriving until the next update is due is merged into it
+            self._receive(min(next_update - now, POLL_INTERVAL) if self._tracker else POLL_INTERVAL)
+
+    def update(self):
+        """Send the damaged regions to the display, merged to minimize the bus traffic."""
+        rects = self._tracker.plan(self.display.color_mode['bytes2'] / 2)
+        self._tracker.clear()
+        for left, top, right, bottom in rects:
+            self.display.blit(left, top, self._region(left, top, right, bottom))
+        if rects:
+            self.updates += 1
+
+    def _region(self, left, top, right, bottom):
+        """Get a region of the framebuffer, as a NumPy array or PIL image."""
+        if self._array is not None:
+            return self._array[top:bottom, left:right]
+        if self._image is None:
+            from PIL import Image  # pylint: disable=C0415
+            self._image = Image.frombuffer('RGB', (self.width, self.height), memoryview(self._map)[HEADER_SIZE:],
+                                           'raw', 'RGB', 0, 1)
+        return self._image.crop((left, top, right, bottom))
+
+    def _receive(self, timeout):
+        """Wait for damage messages, then read all the pending ones."""
+        if not select.select([self._socket], [], [], max(0, timeout))[0]:
+            return
+        while True:
+            try:
+                message = self._socket.recv(MAX_MESSAGE, socket.MSG_DONTWAIT)
+            except BlockingIOError:
+                return
+            if not message:
+                self._tracker.add_all()
+            for offset in range(0, len(message) - DAMAGE.size + 1, DAMAGE.size):
+                self._tracker.add(DAMAGE.unpack_from(message, offset))
+
+
+class FramebufferClient:
+    """Draw to the shared framebuffer of a `FramebufferDaemon`.
+
+    Pixels are written directly to the shared memory, either with `write` or
+    through `array`, and sent once reported with `damage`. The daemon does not
+    lock the framebuffer, so several clients should draw to distinct regions.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, socket_path=None):
+        """Map the framebuffer of a running daemon.
+
+        Args:
+            path:           framebuffer file of the daemon
+            socket_path:    damage socket, defaults to `path` followed by `.sock`
+        """
+        with open(path, 'r+b') as file:
+            self._map = mmap.mmap(file.fileno(), 0)
+        magic, version, self.width, self.height, self.stride = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError("%s is not a version %d framebuffer" % (path, VERSION))
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.connect(_socket_path(path, socket_path))
+        self._array = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_trace):
+        self.close()
+
+    def close(self):
+        """Unmap the framebuffer and close the damage socket."""
+        self._socket.close()
+        self._array = None
+        self._map.close()
+
+    @property
+    def array(self):
+        """NumPy array of shape (height, width, 3) sharing the framebuffer memory."""
+        if self._array is None:
+            array = np.frombuffer(self._map, np.uint8, self.stride * self.height, HEADER_SIZE)
+            self._array = array.reshape(self.height, self.width, 3)
+        return self._array
+
+    def write(self, x, y, source):
+        """Copy an image to the framebuffer, clipped to the screen, and report it as damaged.
+
+        Args:
+            x:      horizontal position of the left side, may be negative
+            y:      vertical position of the top side, may be negative
+            source: PIL image or NumPy array of shape (height, width, 3)
+
+        Returns:
+            The (left, top, right, bottom) region written, or None if the
+            source is outside the screen.
+        """
+        if hasattr(source, 'shape'):
+            width, height = source.shape[1], source.shape[0]
+        else:
+            width, height = source.size
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + width, self.width), min(y + height, self.height)
+        if left >= right or top >= bottom:
+            return None
+        clip = (left - x, top - y, right - x, bottom - y)
+        if hasattr(source, 'shape'):
+            data = source[clip[1]:clip[3], clip[0]:clip[2], :3].astype('uint8', copy=False).tobytes()
+        else:
+            data = source.crop(clip).convert('RGB').tobytes()
+        row = (right - left) * 3
+        for index in range(bottom - top):
+            offset = HEADER_SIZE + (top + index) * self.stride + left * 3
+            self._map[offset:offset + row] = data[index * row:(index + 1) * row]
+        self.damage((left, top, right, bottom))
+        return left, top, right, bottom
+
+    def damage(self, *rects):
+        """Report regions as changed, the whole screen if none is given.
+
+        Args:
+            *rects: (left, top, right, bottom) rectangles
+        """
+        if not rects:
+            self._socket.send(b'')
+            return
+        # an empty message would damage the whole screen, rectangles outside of it are dropped instead
+        data = b''.join(DAMAGE.pack(*rect) for rect in (damage.clip_rect(rect, self.width, self.height)
+                                                        for rect in rects) if rect is not None)
+        for start in range(0, len(data), MAX_MESSAGE):
+            self._socket.send(data[start:start + MAX_MESSAGE])
+
+
+def main(argv=None):
+    """Run the daemon from the command line."""
+    from .display import Display  # pylint: disable=C0415
+    from .interface import get_backend  # pylint: disable=C0415
+    parser = argparse.ArgumentParser(prog='python3 -m st7789v.daemon', description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default=DEFAULT_PATH, help='framebuffer file (default: %s)' % DEFAULT_PATH)
+    parser.add_argument('--socket', help='damage socket (default: framebuffer file followed by .sock)')
+    parser.add_argument('--fps', type=float, default=30, help='maximum updates per second (default: 30)')
+    parser.add_argument('--backend', default='RaspberryPi', help='interface backend (default: RaspberryPi)')
+    parser.add_argument('--color-mode', type=int, default=565, choices=(444, 565, 666),
+                        help='color mode (default: 565)')
+    parser.add_argument('--rotation', type=int, default=0, choices=(0, 90, 180, 270),
+                        help='rotation in degrees (default: 0)')
+    args = parser.parse_args(argv)
+
+    with get_backend(args.backend)() as io:
+        display = Display(io)
+        display.initialize(color_mode=args.color_mode, rotation=args.rotation)
+        with FramebufferDaemon(display, args.path, args.socket, args.fps) as daemon:
+            print('Serving %s (%dx%d)' % (daemon.path, daemon.width, daemon.height))
+            try:
+                daemon.serve()
+            except KeyboardInterrupt:
+                pass
+
+
+if __name__ == '__main__':
+    main()
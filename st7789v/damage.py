@@ -0,0 +1,305 @@
+"""Damage tracking for buffered drawing.
+
+Rectangles are (left, top, right, bottom) tuples, with left/top included
+and right/bottom excluded, as used by `Display.set_bounds`.
+"""
+import heapq
+import math
+
+# Bytes sent on the bus to open a window: CASET, RASET and RAMWR with their arguments
+COMMAND_BYTES = 3 + 4 + 4
+# SPI writes and GPIO changes of a window write: for each of CASET, RASET and
+# RAMWR, DC low, the command byte, DC high and its arguments
+WINDOW_CALLS = 12
+# Rough time of a spidev write or RPi.GPIO output call on a Raspberry Pi, in seconds
+CALL_TIME = 2e-6
+# SPI clock of the Raspberry Pi backend, in Hz
+SPI_SPEED_HZ = 90000000
+
+
+def transaction_overhead(spi_speed_hz=SPI_SPEED_HZ, call_time=CALL_TIME):
+    """Cost of the calls of a window write, in bytes of pixel data which could be sent instead.
+
+    Args:
+        spi_speed_hz:   SPI clock, in Hz
+        call_time:      time of an SPI write or GPIO change, in seconds,
+                        which depends on the platform and interface
+    """
+    return int(round(WINDOW_CALLS * call_time * spi_speed_hz / 8))
+
+
+# Default cost of the calls of a window write, see `transaction_overhead`
+TRANSACTION_OVERHEAD = transaction_overhead()
+
+
+def window_write_cost(overhead=TRANSACTION_OVERHEAD):
+    """Cost of a CASET/RASET/RAMWR sequence, in bytes of pixel data.
+
+    Args:
+        overhead:   cost of the GPIO changes and syscalls of a window write,
+                    see `transaction_overhead`
+    """
+    return COMMAND_BYTES + overhead
+
+
+# Default cost of a window write, see `window_write_cost`
+TRANSACTION_COST = window_write_cost()
+# Above this number of pending rectangles, new rectangles are merged into the cheapest one
+MAX_RECTS = 32
+
+_NON_DRAWING = frozenset(('textbbox', 'textlength', 'multiline_textbbox', 'getfont', 'font',
+                          'fontmode', 'fill', 'ink', 'mode', 'palette', 'im', 'draw'))
+
+
+def rect_area(rect):
+    """Number of pixels in a rectangle."""
+    left, top, right, bottom = rect
+    return (right - left) * (bottom - top)
+
+
+def rect_union(rect_a, rect_b):
+    """Smallest rectangle containing both rectangles."""
+    return (min(rect_a[0], rect_b[0]), min(rect_a[1], rect_b[1]),
+            max(rect_a[2], rect_b[2]), max(rect_a[3], rect_b[3]))
+
+
+def rect_intersects(rect_a, rect_b):
+    """Whether two rectangles overlap."""
+    return (rect_a[0] < rect_b[2] and rect_b[0] < rect_a[2]
+            and rect_a[1] < rect_b[3] and rect_b[1] < rect_a[3])
+
+
+def clip_rect(rect, width, height):
+    """Clip a rectangle to a (0, 0, width, height) area, returning None if it is empty."""
+    left, top = max(0, int(math.floor(rect[0]))), max(0, int(math.floor(rect[1])))
+    right, bottom = min(width, int(math.ceil(rect[2]))), min(height, int(math.ceil(rect[3])))
+    if left >= right or top >= bottom:
+        return None
+    return (left, top, right, bottom)
+
+
+class CostModel:
+    """Estimate the cost of sending rectangles to the display."""
+
+    def __init__(self, bytes_per_pixel, transaction_cost=TRANSACTION_COST):
+        """Define the cost parameters.
+
+        Args:
+            bytes_per_pixel:    bytes sent per pixel in the current color mode
+            transaction_cost:   fixed cost of a window write, in bytes, see
+                                `window_write_cost`
+        """
+        self.bytes_per_pixel = bytes_per_pixel
+        self.transaction_cost = transaction_cost
+
+    def cost(self, rect):
+        """Cost of sending a single rectangle."""
+        return self.transaction_cost + rect_area(rect) * self.bytes_per_pixel
+
+    def total_cost(self, rects):
+        """Cost of sending several rectangles separately."""
+        return sum(self.cost(rect) for rect in rects)
+
+    def gain(self, rect_a, rect_b):
+        """Cost saved by sending two rectangles as their union.
+
+        Overlapping rectangles are never worth sending separately, as the
+        overlapping pixels would be sent twice.
+        """
+        gain = self.cost(rect_a) + self.cost(rect_b) - self.cost(rect_union(rect_a, rect_b))
+        return max(gain, 0) if rect_intersects(rect_a, rect_b) else gain
+
+    def merge(self, rects):
+        """Merge rectangles while doing so is not more expensive.
+
+        The pair with the greatest gain is merged first. Gains are kept in a
+        heap, so that only the pairs of a merged rectangle are evaluated again.
+        """
+        rects = list(rects)
+        # each slot's version, heap entries of previous versions are stale
+        versions = [0] * len(rects)
+        heap = [(-self.gain(rects[i], rects[j]), i, j, 0, 0)
+                for i in range(len(rects)) for j in range(i + 1, len(rects))]
+        heapq.heapify(heap)
+        while heap:
+            loss, i, j, version_i, version_j = heapq.heappop(heap)
+            if None in (rects[i], rects[j]) or (versions[i], versions[j]) != (version_i, version_j):
+                continue
+            if loss > 0:
+                break
+            rects[i] = rect_union(rects[i], rects[j])
+            rects[j] = None
+            versions[i] += 1
+            for k, other in enumerate(rects):
+                if other is not None and k != i:
+                    first, second = min(i, k), max(i, k)
+                    heapq.heappush(heap, (-self.gain(rects[i], other), first, second,
+                                          versions[first], versions[second]))
+        return [rect for rect in rects if rect is not None]
+
+    def plan(self, rects, width, height):
+        """Choose the rectangles to send to update the given damaged areas.
+
+        Returns:
+            A list of rectangles, which is the full (0, 0, width, height)
+            area if sending it is cheaper than the merged rectangles.
+        """
+        if not rects:
+            return []
+        full = (0, 0, width, height)
+        merged = self.merge(rects)
+        if self.total_cost(merged) >= self.cost(full):
+            return [full]
+        return merged
+
+
+class DamageTracker:
+    """Accumulate damaged rectangles of a buffer."""
+
+    def __init__(self, width, height, transaction_cost=TRANSACTION_COST, bytes_per_pixel=2):
+        """Create an empty tracker.
+
+        Args:
+            width:              buffer width
+            height:             buffer height
+            transaction_cost:   fixed cost of a window write, see `CostModel`
+            bytes_per_pixel:    bytes per pixel used to merge rectangles beyond
+                                `MAX_RECTS`, updated by `plan`
+        """
+        self.width = width
+        self.height = height
+        self.transaction_cost = transaction_cost
+        self.bytes_per_pixel = bytes_per_pixel
+        self._rects = []
+
+    def __bool__(self):
+        return bool(self._rects)
+
+    @property
+    def rects(self):
+        """List of pending damaged rectangles."""
+        return list(self._rects)
+
+    def add(self, rect):
+        """Mark a rectangle as damaged; it is clipped to the buffer."""
+        rect = clip_rect(rect, self.width, self.height)
+        if rect is None:
+            return
+        for i, other in enumerate(self._rects):
+            if other[0] <= rect[0] and other[1] <= rect[1] and rect[2] <= other[2] and rect[3] <= other[3]:
+                return
+            if rect[0] <= other[0] and rect[1] <= other[1] and other[2] <= rect[2] and other[3] <= rect[3]:
+                self._rects[i] = rect
+                return
+        if len(self._rects) < MAX_RECTS:
+            self._rects.append(rect)
+            return
+        # too many rectangles, merge the new one into the rectangle where it costs the least
+        model = CostModel(self.bytes_per_pixel, self.transaction_cost)
+        _, i = min((-model.gain(other, rect), i) for i, other in enumerate(self._rects))
+        self._rects[i] = rect_union(self._rects[i], rect)
+
+    def add_all(self):
+        """Mark the whole buffer as damaged."""
+        self._rects = [(0, 0, self.width, self.height)]
+
+    def clear(self):
+        """Forget all damaged rectangles."""
+        self._rects = []
+
+    def plan(self, bytes_per_pixel):
+        """Get the rectangles to send, see `CostModel.plan`."""
+        self.bytes_per_pixel = bytes_per_pixel
+        model = CostModel(bytes_per_pixel, self.transaction_cost)
+        return model.plan(self._rects, self.width, self.height)
+
+
+def _flatten(values):
+    """Flatten nested coordinate sequences into a list of numbers."""
+    if isinstance(values, (int, float)):
+        return [values]
+    flat = []
+    for value in values:
+        flat.extend(_flatten(value))
+    return flat
+
+
+def xy_bounds(xy, pad=0):
+    """Bounding rectangle of ImageDraw coordinates, padded by `pad` pixels."""
+    flat = _flatten(xy)
+    x_values, y_values = flat[0::2], flat[1::2]
+    return (min(x_values) - pad, min(y_values) - pad,
+            max(x_values) + 1 + pad, max(y_values) + 1 + pad)
+
+
+class DamageDraw:
+    """ImageDraw proxy recording the bounding box of every drawing call.
+
+    Attributes which are not drawing methods, such as `textbbox` or `font`,
+    are forwarded as-is. Unknown drawing methods damage the whole buffer.
+    """
+
+    def __init__(self, draw, image, tracker):
+        """Wrap an ImageDraw object.
+
+        Args:
+            draw:       the ImageDraw.Draw object to wrap
+            image:      the image it draws to
+            tracker:    the DamageTracker to report to
+        """
+        self._draw = draw
+        self._image = image
+        self._tracker = tracker
+
+    def __getattr__(self, name):
+        attr = getattr(self._draw, name)
+        if name.startswith('_') or name in _NON_DRAWING or not callable(attr):
+            return attr
+
+        def method(*args, **kwargs):
+            self._tracker.add(self._bounds(name, args, kwargs))
+            return attr(*args, **kwargs)
+        method.__name__ = name
+        method.__doc__ = attr.__doc__
+        return method
+
+    def _bounds(self, name, args, kwargs):
+        """Bounding box of a drawing call."""
+        # pylint: disable=R0911
+        xy = kwargs['xy'] if 'xy' in kwargs else (args[0] if args else None)
+        pad = kwargs.get('width', 0) or 0
+        if name in ('text', 'multiline_text'):
+            text = kwargs['text'] if 'text' in kwargs else args[1]
+            bbox_kw = {k: v for k, v in kwargs.items() if k in (
+                'font', 'anchor', 'spacing', 'align', 'direction', 'features',
+                'language', 'stroke_width', 'embedded_color', 'font_size')}
+            if name == 'text':
+                bbox = self._draw.textbbox(xy, text, **bbox_kw)
+            else:
+                bbox = self._draw.multiline_textbbox(xy, text, **bbox_kw)
+            return (bbox[0], bbox[1], bbox[2] + 1, bbox[3] + 1)
+        if name == 'bitmap':
+            bitmap = kwargs['bitmap'] if 'bitmap' in kwargs else args[1]
+            return (xy[0], xy[1], xy[0] + bitmap.size[0], xy[1] + bitmap.size[1])
+        if name == 'regular_polygon':
+            circle = kwargs['bounding_circle'] if 'bounding_circle' in kwargs else args[0]
+            flat = _flatten(circle)
+            x, y, radius = flat[0], flat[1], flat[2]
+            return xy_bounds((x - radius, y - radius, x + radius, y + radius), pad)
+        if xy is None:
+            return (0, 0, self._tracker.width, self._tracker.height)
+        try:
+            return xy_bounds(xy, pad)
+        except (TypeError, ValueError, IndexError):
+            return (0, 0, self._tracker.width, self._tracker.height)
+
+    def paste(self, image, box=None, mask=None):
+        """Paste an image into the buffer, see `PIL.Image.Image.paste`."""
+        if box is None:
+            rect = (0, 0, self._tracker.width, self._tracker.height)
+        elif len(box) == 2:
+            rect = (box[0], box[1], box[0] + image.size[0], box[1] + image.size[1])
+        else:
+            rect = tuple(box)
+        self._tracker.add(rect)
+        self._image.paste(image, box, mask)
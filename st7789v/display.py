@@ -1,9 +1,17 @@
 """ST7789V display controller."""
+import contextlib
+import math
 import time
 from . import colors
 from . import commands
+from . import framediff
+from . import sprite
+from . import text as text_atlas
+from . import lazy
 from .interface import IOWrapper
 
+np = lazy.optional_import('numpy')
+
 ROT_TO_MADCTL = {
     0: [0x00, 0x40],
     90: [0x60, 0xE0],
@@ -30,13 +38,26 @@ class Display:
         self.width = self.base_width
         self.height = self.base_height
         self.image_to_rgb = None
+        self.frame_diff = None
+        self._scroll = None
+        self.vsync = False
+        self.dither = False
+        self._registers = {}
+        self._transaction = False
+        self._instrument = None
+        self._band_out = None
+        self._band_scratch = None
+        self._pipeline = None
+        self._pipeline_chunks = 8
+        self._pipeline_buffers = None
 
     @property
     def initialized(self):
         """Whether the display has been initialized."""
         return self._initialized
 
-    def initialize(self, color_mode=565, inverted=True, rotation=0, mirrored=False, bounds=None, reset=True):
+    def initialize(self, color_mode=565, inverted=True, rotation=0, mirrored=False, bounds=None, reset=True,
+                   dither=False):
         """Initialize the display.
 
         Args:
@@ -46,12 +67,15 @@ class Display:
             mirrored:   Whether the displayed image should be mirrored (along the Y axis).
             bounds:     (left, top, right, bottom) tuple of drawing region bounds.
             reset:      Whether to trigger a hardware reset before initializing.
+            dither:     Whether to apply ordered dithering when converting frames
+                        to RGB 4-4-4 or 5-6-5. Requires NumPy.
         """
         if not self._io.is_open():
             raise ValueError("IO wrapper is not opened")
         if reset:
             self.reset()
         self._initialized = True
+        self.dither = dither
 
         # Set colors
         self.set_color_mode(color_mode)
@@ -84,6 +108,7 @@ class Display:
         self.color_mode = colors.MODES[colmod]
         self.image_to_rgb = self.color_mode['func']
         self.command('COLMOD', self.color_mode['id'])
+        self._gram_changed()
 
     def set_madctl(self, mirror_y=False, mirror_x=False, exchange=False, madctl=None):
         """Set MADCTL (Memory Data Access Control) register.
@@ -100,9 +125,11 @@ class Display:
         if madctl is None:
             madctl = mirror_y << 7 | mirror_x << 6 | exchange << 5
         self.mv = bool(madctl & 0x20)
+        self.my = bool(madctl & 0x80)
         self.max_w = (self.base_height if self.mv else self.base_width) - 1
         self.max_h = (self.base_width if self.mv else self.base_height) - 1
         self.command('MADCTL', madctl)
+        self._gram_changed()
 
     def set_bounds(self, left, top, right, bottom):
         """Set columns & row addresses for memory writes.
@@ -125,6 +152,165 @@ class Display:
         self.command('CASET', left.to_bytes(2, 'big') + (right-1).to_bytes(2, 'big'))
         self.command('RASET', top.to_bytes(2, 'big') + (bottom-1).to_bytes(2, 'big'))
 
+    def set_scroll_area(self, top_fixed=0, bottom_fixed=0):
+        """Define the vertical scrolling area and reset the scroll offset.
+
+        Scrolling moves the rows between the top and bottom fixed areas
+        without sending them again, see `scroll`. It is only available when
+        X and Y are not exchanged (rotation of 0 or 180).
+
+        Args:
+            top_fixed:      number of rows at the top of the screen which do not scroll
+            bottom_fixed:   number of rows at the bottom of the screen which do not scroll
+        """
+        if self.mv:
+            raise ValueError("Vertical scrolling requires a rotation of 0 or 180")
+        lines = self.base_height
+        if top_fixed < 0 or bottom_fixed < 0 or top_fixed + bottom_fixed >= lines:
+            raise ValueError("Invalid fixed areas: expected 0 <= TOP + BOTTOM < %d, got TOP=%d and BOTTOM=%d"
+                             % (lines, top_fixed, bottom_fixed))
+        # the chip defines scrolling along display lines, which are reversed when MY is set
+        tfa, bfa = (bottom_fixed, top_fixed) if self.my else (top_fixed, bottom_fixed)
+        vsa = lines - tfa - bfa
+        self.command('VSCRDEF', tfa.to_bytes(2, 'big') + vsa.to_bytes(2, 'big') + bfa.to_bytes(2, 'big'))
+        self._scroll = {'tfa': tfa, 'vsa': vsa, 'bfa': bfa, 'offset': 0}
+        self.command('VSCSAD', tfa.to_bytes(2, 'big'))
+        self._gram_changed()
+
+    @property
+    def scroll_offset(self):
+        """Number of rows the scrolling area has been scrolled up by."""
+        if self._scroll is None:
+            return 0
+        return (-self._scroll['offset'] if self.my else self._scroll['offset']) % self._scroll['vsa']
+
+    def scroll(self, lines, rows=None):
+        """Scroll the scrolling area, see `set_scroll_area`.
+
+        Args:
+            lines:  number of rows to scroll up by (the content moves up),
+                    or down by if negative
+            rows:   optional data for the rows exposed by scrolling, which are
+                    the last `lines` rows of the scrolling area when scrolling
+                    up, or the first ones when scrolling down (see `to_native`)
+        """
+        if self._scroll is None:
+            self.set_scroll_area()
+        scroll = self._scroll
+        scroll['offset'] = (scroll['offset'] + (-lines if self.my else lines)) % scroll['vsa']
+        self._sync_frame()
+        self.command('VSCSAD', (scroll['tfa'] + scroll['offset']).to_bytes(2, 'big'))
+        self._gram_changed()
+        if rows is not None and lines:
+            top, bottom = self._scroll_area()
+            first = bottom - lines if lines > 0 else top
+            self.write_rows(first, rows)
+
+    def _scroll_area(self):
+        """Logical (top, bottom) rows of the scrolling area."""
+        scroll = self._scroll
+        top = scroll['bfa'] if self.my else scroll['tfa']
+        return top, top + scroll['vsa']
+
+    def physical_row(self, row):
+        """Row address to write to for a pixel to appear on a given screen row.
+
+        Rows outside of the scrolling area, or when scrolling is not used,
+        map to themselves.
+
+        Args:
+            row:    screen row, from 0 to the screen height (excluded)
+        """
+        if self._scroll is None or self.mv:
+            return row
+        scroll = self._scroll
+        lines = self.base_height
+        line = lines - 1 - row if self.my else row
+        if scroll['tfa'] <= line < scroll['tfa'] + scroll['vsa']:
+            line = scroll['tfa'] + (line - scroll['tfa'] + scroll['offset']) % scroll['vsa']
+        return lines - 1 - line if self.my else line
+
+    def write_rows(self, top, data, left=0, right=None):
+        """Write full rows of pixels at a screen position, following scrolling.
+
+        Rows which wrap around in memory because of scrolling are split into
+        several writes. The bounds are left set to the last region written.
+
+        Args:
+            top:    first screen row to write to
+            data:   pixel data, see `to_native`
+            left:   left bound (included)
+            right:  right bound (excluded), defaults to the screen width
+        """
+        right = self.max_w if right is None else right
+        row_bytes = (right - left) * self.color_mode['bytes2']
+        if row_bytes % 2:
+            raise ValueError("Row width must be even in RGB 4-4-4 mode")
+        row_bytes //= 2
+        native = memoryview(self.to_native(data))
+        count = len(native) // row_bytes
+        if not count or top < 0 or top + count > self.max_h:
+            raise ValueError("Expected rows between 0 and %d, got %d rows from %d" % (self.max_h, count, top))
+        start = 0
+        while start < count:
+            address = self.physical_row(top + start)
+            end = start + 1
+            while end < count and self.physical_row(top + end) == address + end - start:
+                end += 1
+            self._write_window(left, address, right, address + end - start,
+                               native[start * row_bytes:end * row_bytes])
+            start = end
+        self._gram_changed()
+
+    def enable_vsync(self, scanline=None):
+        """Synchronize frame writes with the display refresh.
+
+        This enables the tearing effect output of the display, and frame
+        writes then wait for a rising edge on the IO wrapper's TE pin, which
+        also limits the frame rate to the display refresh rate.
+
+        Args:
+            scanline:   Scanline on which the signal is emitted, None to emit
+                        it at the start of the vertical blanking period.
+        """
+        if self._io.te is None:
+            raise ValueError("IO wrapper has no TE pin")
+        if scanline is not None:
+            self.command('STE', scanline.to_bytes(2, 'big'))
+        self.command('TEON', 0x00)
+        self.vsync = True
+
+    def disable_vsync(self):
+        """Stop synchronizing frame writes with the display refresh."""
+        self.command('TEOFF')
+        self.vsync = False
+
+    def wait_vsync(self, frames=1, timeout=0.1):
+        """Wait for the tearing effect signal.
+
+        Args:
+            frames:     number of signals to wait for
+            timeout:    maximum time to wait for each signal, in seconds
+
+        Returns:
+            Whether all signals were received before timing out.
+        """
+        for _ in range(frames):
+            if not self._io.wait_edge(self._io.te, timeout):
+                return False
+        return True
+
+    def get_scanline(self):
+        """Read the scanline currently refreshed by the display (GSCAN)."""
+        data = self.command('GSCAN')
+        # the first byte is a dummy read
+        return (data[1] & 0x03) << 8 | data[2]
+
+    def _sync_frame(self):
+        """Wait for the display refresh before writing a frame, if enabled."""
+        if self.vsync:
+            self.wait_vsync()
+
     def turn_on(self):
         """Turn the display on."""
         self.command('SLPOUT')
@@ -140,7 +326,9 @@ class Display:
 
         See commands.py for the full list, or the chip specification.
         This validates the input data and raises an error if it
-        does not match the command specification.
+        does not match the command specification. Writes to COLMOD, MADCTL,
+        CASET, RASET and INVON/INVOFF are skipped if the register already
+        holds the same value.
 
         Args:
             name:   command name
@@ -152,23 +340,36 @@ class Display:
         """
         if not self._initialized:
             raise ValueError("Uninitialized display, call initialize() first")
+        cmd = commands.compiled.get(name) or commands.compiled[name.upper()]
         # cast data to bytes
-        if isinstance(data, int):
-            data = [data]
-        if isinstance(data, (list, tuple)):
-            data = bytes(data)
-        # get command info
-        cmd = commands.by_name[name.upper()]
-        wrx, rdx = cmd['wrx'], cmd['rdx']
+        if data is not None and not isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes([data]) if isinstance(data, int) else bytes(data)
         # check data length
+        wrx = cmd.wrx
         if wrx > 0 and (data is None or len(data) != wrx):
             raise ValueError('Expected %d bytes of data for command %s' % (wrx, name))
         if wrx == 0 and data:
             raise ValueError('No data expected for command %s but got %d bytes' % (name, len(data)))
+        # skip redundant register writes
+        state = None
+        if cmd.shadow is not None:
+            state = (cmd.id, data if data is None else bytes(data))
+            if self._registers.get(cmd.shadow) == state:
+                return None
+            # the register is unknown until the command is sent, in case sending fails
+            self._registers.pop(cmd.shadow, None)
+        elif cmd.id == 0x01:  # SWRESET
+            self._registers.clear()
+        if self._instrument is not None:
+            self._instrument.command(cmd.name, len(data) if data else 0)
         # send command and read result
-        self.raw_command(cmd['id'], data)
-        if rdx > 0 and read:
-            return self._io.spi_read(rdx)
+        with self._io.bus_lock:
+            self._io.send_command(cmd.header, data, self._transaction)
+            if state is not None:
+                self._registers[cmd.shadow] = state
+            if cmd.rdx > 0 and read:
+                return self._io.spi_read(cmd.rdx)
+        return None
 
     def raw_command(self, cmd: int, data=None):
         """Send a raw command to the display.
@@ -177,26 +378,475 @@ class Display:
             cmd:    the command ID (numeric)
             data:   a single byte (int), list of ints or bytes object to send
         """
-        self._io.set_low(self._io.cs)
-        self._io.set_low(self._io.dc)
-        self._io.spi_write(bytes([cmd]))
-        if data:
-            # cast data to bytes
-            if isinstance(data, int):
-                data = [data]
-            if isinstance(data, (list, tuple)):
-                data = bytes(data)
-            self._io.set_high(self._io.dc)
-            self._io.spi_write(data)
-        self._io.set_high(self._io.cs)
+        if data is not None and not isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes([data]) if isinstance(data, int) else bytes(data)
+        # the register value is unknown, as no validation is done
+        shadow = commands.SHADOWED.get(cmd)
+        if shadow is not None:
+            self._registers.pop(shadow, None)
+        if self._instrument is not None:
+            info = commands.by_id.get(cmd)
+            self._instrument.command(info['name'] if info else '%02Xh' % cmd, len(data) if data else 0)
+        with self._io.bus_lock:
+            self._io.send_command(commands.headers[cmd], data, self._transaction)
+
+    def instrument(self, *sinks):
+        """Report commands, conversions, transfers and frames to sinks.
+
+        See the `instrumentation` module for available sinks. Calling this
+        again replaces the previous sinks.
+
+        Args:
+            *sinks: sinks, such as `instrumentation.Stats()`
+
+        Returns:
+            The `instrumentation.Instrumentation` object used.
+        """
+        from . import instrumentation  # pylint: disable=C0415
+        self._instrument = instrumentation.Instrumentation(*sinks)
+        self._io.instrument(self._instrument)
+        return self._instrument
+
+    def uninstrument(self):
+        """Stop reporting events, see `instrument`."""
+        self._instrument = None
+        self._io.uninstrument()
+
+    def clear_registers(self):
+        """Forget the known register values, so that they are sent again.
+
+        This is needed if the display was reset without calling `reset`.
+        """
+        self._registers.clear()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Keep CS asserted while sending several commands.
+
+        The interface's bus lock is held for the whole transaction.
+
+        Usage:
+            with display.transaction():
+                display.set_bounds(0, 0, 16, 16)
+                display.command('RAMWR', data)
+        """
+        if self._transaction:
+            yield
+            return
+        with self._io.bus_lock:
+            self._io.set_low(self._io.cs)
+            self._transaction = True
+            try:
+                yield
+            finally:
+                self._transaction = False
+                self._io.set_high(self._io.cs)
+
+    def _write_window(self, left, top, right, bottom, data):
+        """Set the bounds and write pixel data in a single transaction."""
+        with self.transaction():
+            self.set_bounds(left, top, right, bottom)
+            self.command('RAMWR', data)
 
     def draw_rgb_bytes(self, image_data: list):
         """Expects a list of [R,G,B] elements."""
-        data = self.image_to_rgb(image_data[:self.width*self.height])
-        self.command('RAMWR', data)
+        instrument = self._instrument
+        start = instrument.clock() if instrument is not None else None
+        array = self._pipeline_array(image_data[:self.width*self.height], self.width)
+        if array is not None:
+            self._gram_changed()
+            self._sync_frame()
+            with self.transaction():
+                self._write_pipelined(array)
+        else:
+            data = self._dithered(image_data[:self.width*self.height])
+            if data is None:
+                data = self.image_to_rgb(image_data[:self.width*self.height])
+            if instrument is not None:
+                instrument.convert(start, len(data))
+            self._gram_changed()
+            self._sync_frame()
+            self.command('RAMWR', data)
+        if instrument is not None:
+            instrument.frame(start)
+
+    def enable_pipeline(self, chunks=8):
+        """Overlap the conversion and the transfer of frames.
+
+        Frames drawn with `draw_frame` and `draw_rgb_bytes` are then split in
+        chunks of rows: a worker thread converts each chunk while the previous
+        one is being sent, with RAMWR then WRMEMC. This applies to NumPy arrays
+        and PIL images, when frame differencing is disabled. Chunk sizes are
+        rounded to a multiple of the interface's SPI transfer limit. The worker
+        is stopped when the IO wrapper is closed.
+
+        Args:
+            chunks: number of chunks per frame, more chunks send the first
+                    pixels sooner but add a small cost per chunk
+        """
+        import concurrent.futures  # pylint: disable=C0415
+        self.disable_pipeline()
+        self._pipeline = concurrent.futures.ThreadPoolExecutor(1)
+        self._pipeline_chunks = chunks
+        self._pipeline_buffers = None
+        self._io.add_close_callback(self.disable_pipeline)
+
+    def disable_pipeline(self):
+        """Convert frames before sending them, see `enable_pipeline`."""
+        if self._pipeline is None:
+            return
+        self._io.remove_close_callback(self.disable_pipeline)
+        executor, self._pipeline = self._pipeline, None
+        executor.shutdown()
+        self._pipeline_buffers = None
+
+    def _pipeline_array(self, frame, width):
+        """Get a frame as an RGB array of shape (height, width, 3) if it can be pipelined, else None."""
+        if self._pipeline is None or self.color_mode['array'] is None:
+            return None
+        if hasattr(frame, 'getdata'):
+            return np.asarray(frame if frame.mode == 'RGB' else frame.convert('RGB'))
+        ndim = getattr(frame, 'ndim', 0)
+        if ndim == 3:
+            return frame
+        if ndim == 2 and len(frame) % width == 0:
+            return frame.reshape(-1, width, 3)
+        return None
+
+    def _write_pipelined(self, array):
+        """Convert and write an RGB array in chunks, converting the next chunk while writing one."""
+        height, width = array.shape[:2]
+        mode = self.color_mode
+        row_bytes = width * mode['bytes2'] / 2
+        limit = self._io.spi_limit or 1
+        # round chunks up to a multiple of the transfer limit, with whole pairs of RGB 4-4-4 pixels
+        chunk_bytes = math.ceil(height * row_bytes / self._pipeline_chunks / limit) * limit
+        rows = max(1, min(height, int(chunk_bytes // row_bytes)))
+        if mode['bytes2'] % 2 and width % 2:
+            rows += rows % 2
+        size = rows * width
+        if self._pipeline_buffers is None or len(self._pipeline_buffers[0][0]) < size * 3:
+            self._pipeline_buffers = [(bytearray(size * 3), np.empty(size * 4 + 1, dtype=np.uint8))
+                                      for _ in range(2)]
+        instrument = self._instrument
+
+        def convert(index):
+            start = instrument.clock() if instrument is not None else None
+            top = index * rows
+            out, scratch = self._pipeline_buffers[index % 2]
+            data = self._convert_rows(array[top:top + rows], top, out, scratch)
+            if instrument is not None:
+                instrument.convert(start, len(data))
+            return data
+
+        count = -(-height // rows)
+        pending = self._pipeline.submit(convert, 0)
+        for index in range(count):
+            data = pending.result()
+            if index + 1 < count:
+                # the other buffer is free, as the chunk it held has been sent
+                pending = self._pipeline.submit(convert, index + 1)
+            self.command('RAMWR' if index == 0 else 'WRMEMC', data)
+
+    def _convert_rows(self, rows, top, out, scratch):
+        """Convert an RGB array of shape (height, width, 3) in place, see `colors.MODES`."""
+        mode = self.color_mode
+        if self.dither and mode['dither'] is not None:
+            return mode['dither'](rows, out, scratch, 0, top)
+        if mode['bytes2'] % 2:
+            rows = rows.reshape(-1, 3)
+        return mode['array'](rows, out, scratch)
+
+    def draw_bands(self, bands, band_height=None):
+        """Draw a frame covering the whole screen, a band of rows at a time.
+
+        The first band is written with RAMWR and the following ones with
+        WRMEMC, which continues where the previous write stopped. Bands of
+        NumPy arrays are converted into a buffer reused between bands and
+        calls, so that memory use depends on the band size, not the screen size.
+        The bounds are left set to the whole screen.
+
+        Args:
+            bands:          Iterable of bands from top to bottom, each being a
+                            frame (see `to_native`) of whole rows, or a function
+                            called with (top, bottom) row numbers returning one.
+                            For RGB 4-4-4, bands must have an even number of pixels.
+            band_height:    number of rows of each band, needed when `bands`
+                            is a function
+        """
+        if callable(bands):
+            if not band_height:
+                raise ValueError("The band height is needed to render bands")
+            render = bands
+            bands = (render(top, min(top + band_height, self.max_h)) for top in range(0, self.max_h, band_height))
+        instrument = self._instrument
+        start = instrument.clock() if instrument is not None else None
+        self._sync_frame()
+        self._gram_changed()
+        with self.transaction():
+            self.set_bounds(0, 0, self.max_w, self.max_h)
+            name, top = 'RAMWR', 0
+            for band in bands:
+                data, rows = self._convert_band(band, top)
+                self.command(name, data)
+                name, top = 'WRMEMC', top + rows
+        if instrument is not None:
+            instrument.frame(start)
+
+    def _convert_band(self, band, top):
+        """Convert a band of rows for `draw_bands`, returning (data, rows)."""
+        mode = self.color_mode
+        if getattr(band, 'ndim', 0) == 3 and mode['array'] is not None:
+            rows = band.shape[0]
+            count = rows * band.shape[1]
+            if mode['bytes2'] % 2 and count % 2:
+                raise ValueError("RGB 4-4-4 bands must have an even number of pixels")
+            out = self._band_out
+            if out is None or len(out) < count * 3:
+                # 3 bytes per pixel fits every color mode, 4 bytes of scratch as for FrameBuffer
+                out = self._band_out = bytearray(count * 3)
+                self._band_scratch = np.empty(count * 4 + 1, dtype=np.uint8)
+            return self._convert_rows(band, top, out, self._band_scratch), rows
+        data = self._dithered(band, 0, top)
+        if data is None:
+            data = self.to_native(band)
+        if hasattr(band, 'getdata'):
+            return data, band.height
+        if getattr(band, 'ndim', 2) == 3:
+            return data, band.shape[0]
+        return data, len(band) // self.max_w
+
+    def blit(self, x, y, source, width=None):
+        """Draw pixels at a position of the screen, clipped to the screen.
+
+        The bounds are left set to the region drawn.
+
+        Args:
+            x:      horizontal position of the left side, may be negative
+            y:      vertical position of the top side, may be negative
+            source: `sprite.Sprite`, PIL image, NumPy array of shape (height,
+                    width, 3), or bytes-like object in the current color mode
+            width:  width of `source`, if it is a bytes-like object
+
+        Returns:
+            The (left, top, right, bottom) region drawn, or None if the source
+            is outside the screen.
+        """
+        native = isinstance(source, (bytes, bytearray, memoryview))
+        if native:
+            if not width:
+                raise ValueError("The width is needed to draw bytes")
+            height = len(source) * 2 // (width * self.color_mode['bytes2'])
+        else:
+            width, height = sprite.source_size(source)
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + width, self.max_w), min(y + height, self.max_h)
+        if left >= right or top >= bottom:
+            return None
+        clip = (left - x, top - y, right - x, bottom - y)
+        if native:
+            data = self._clip_native(source, width, height, *clip)
+        elif clip == (0, 0, width, height):
+            data = source.native(self) if isinstance(source, sprite.Sprite) else self.to_native(source)
+        else:
+            if isinstance(source, sprite.Sprite):
+                source = source.source
+            data = self.to_native(sprite.crop(source, *clip))
+        self._gram_changed()
+        self._write_window(left, top, right, bottom, data)
+        return left, top, right, bottom
+
+    def draw_text(self, x, y, text, font=None, fill=(255, 255, 255), background=(0, 0, 0)):
+        """Draw a single line of text with its background, without a buffer.
+
+        Glyphs are rasterized once per font, colors and color mode (see
+        `text.GlyphAtlas`), so drawing text only joins their bytes and writes
+        them to a window.
+
+        Args:
+            x:          horizontal position of the left side
+            y:          vertical position of the top side
+            text:       string to draw
+            font:       PIL font, defaults to PIL's default font
+            fill:       text color, as an (R, G, B) tuple or PIL color name
+            background: background color, as an (R, G, B) tuple or PIL color name
+
+        Returns:
+            The (left, top, right, bottom) region drawn, or None, see `blit`.
+        """
+        if not text:
+            return None
+        width, data = text_atlas.atlas(font, fill, background, self.color_mode).render(text)
+        return self.blit(x, y, data, width)
+
+    def _clip_native(self, data, width, height, left, top, right, bottom):
+        """Get a region of bytes in the current color mode."""
+        if (left, top, right, bottom) == (0, 0, width, height):
+            return data
+        bytes2 = self.color_mode['bytes2']
+        if bytes2 % 2 and (width % 2 or left % 2 or right % 2):
+            # RGB 4-4-4 pixels are packed in pairs, which would need to be split
+            raise ValueError("RGB 4-4-4 data can only be clipped on even columns of even-width sources")
+        view = memoryview(data).cast('B')
+        row = width * bytes2 // 2
+        start, end = left * bytes2 // 2, right * bytes2 // 2
+        if (left, right) == (0, width):
+            return view[top * row:bottom * row]
+        return b''.join(view[y * row + start:y * row + end] for y in range(top, bottom))
+
+    def to_native(self, frame):
+        """Convert a frame to bytes in the current color mode.
+
+        Args:
+            frame:  PIL image, NumPy array of RGB values (2D or 3D),
+                    or list of [R,G,B] elements
+        """
+        instrument = self._instrument
+        start = instrument.clock() if instrument is not None else None
+        data = self._dithered(frame)
+        if data is None and hasattr(frame, 'getdata'):
+            if frame.mode != 'RGB':
+                frame = frame.convert('RGB')
+            data = self.color_mode['image'](frame)
+        elif data is None and np is not None and isinstance(frame, np.ndarray) \
+                and self.color_mode['array'] is not None:
+            # the array converters take views and odd pixel counts as they are
+            data = self.color_mode['array'](np.asarray(frame, dtype=np.uint8).reshape(-1, 3))
+        elif data is None:
+            data = self.image_to_rgb(frame)
+        if instrument is not None:
+            instrument.convert(start, len(data))
+        return data
+
+    def _dithered(self, frame, left=0, top=0):
+        """Convert a frame with ordered dithering.
+
+        Args:
+            frame:  see `to_native`
+            left:   horizontal position of the frame, to align the pattern
+            top:    vertical position of the frame, to align the pattern
+
+        Returns:
+            The converted bytes, or None if dithering is disabled or not
+            supported by the current color mode.
+        """
+        if not self.dither or self.color_mode['dither'] is None or np is None:
+            return None
+        if hasattr(frame, 'getdata'):
+            array = np.asarray(frame if frame.mode == 'RGB' else frame.convert('RGB'))
+        else:
+            array = np.asarray(frame, dtype=np.uint8)
+            if array.ndim == 2:
+                # lists of pixels are expected to cover whole rows
+                width = self.width if len(array) % self.width == 0 else len(array)
+                array = array.reshape(-1, width, 3)
+        return self.color_mode['dither'](array, None, None, left, top)
+
+    def enable_frame_diff(self, tile_width=16, tile_height=16):
+        """Only send the tiles which changed when calling `draw_frame`.
+
+        Args:
+            tile_width:     tile width in pixels, must be even
+            tile_height:    tile height in pixels
+        """
+        self.frame_diff = framediff.FrameDiff(tile_width, tile_height)
+
+    def disable_frame_diff(self):
+        """Send full frames when calling `draw_frame`."""
+        self.frame_diff = None
+
+    def draw_frame(self, frame):
+        """Draw a frame covering the whole screen.
+
+        If frame differencing is enabled, only the tiles which changed since
+        the previous frame are sent, and the bounds are left set to the last
+        region sent.
+
+        Args:
+            frame:  see `to_native`
+
+        Returns:
+            The number of bytes saved by frame differencing.
+        """
+        instrument = self._instrument
+        start = instrument.clock() if instrument is not None else None
+        array = self._pipeline_array(frame, self.max_w) if self.frame_diff is None else None
+        if array is not None:
+            self._sync_frame()
+            with self.transaction():
+                self.set_bounds(0, 0, self.max_w, self.max_h)
+                self._write_pipelined(array)
+            if instrument is not None:
+                instrument.frame(start)
+            return 0
+        return self._draw_native(self.to_native(frame), start)
+
+    def draw_native(self, data):
+        """Draw a frame already converted with `to_native`, see `draw_frame`.
+
+        Args:
+            data:   bytes-like object in the current color mode
+
+        Returns:
+            The number of bytes saved by frame differencing.
+        """
+        instrument = self._instrument
+        return self._draw_native(data, instrument.clock() if instrument is not None else None)
+
+    def _draw_native(self, data, start):
+        """Draw a converted frame, reporting a frame which started at `start`."""
+        instrument = self._instrument
+        self._sync_frame()
+        saved = 0
+        if self.frame_diff is None:
+            self._write_window(0, 0, self.max_w, self.max_h, data)
+        else:
+            with self.transaction():
+                for left, top, right, bottom, chunk in self.frame_diff.diff(
+                        data, self.max_w, self.max_h, self.color_mode['bytes2']):
+                    self._write_window(left, top, right, bottom, chunk)
+            saved = self.frame_diff.last_saved
+        if instrument is not None:
+            instrument.frame(start)
+        return saved
+
+    def play(self, frames, fps=None, ahead=4, workers=1, drop=True, loop=False, callback=None):
+        """Play a sequence of frames, converting them ahead on worker threads.
+
+        Frames are drawn with `draw_native` from the calling thread, which
+        returns once all frames have been played.
+
+        Args:
+            frames:     PIL image or file name of an animation (GIF, APNG...),
+                        NumPy array of frames, or iterable of frames (see
+                        `to_native`) covering the whole screen, as with
+                        `draw_frame`
+            fps:        target frame rate, defaults to the animation's frame
+                        durations, or as fast as possible
+            ahead:      maximum number of frames converted ahead
+            workers:    number of conversion threads
+            drop:       Whether to skip frames which are late
+            loop:       Whether to repeat animations from files or PIL images,
+                        until stopped from `callback`
+            callback:   function called with the `player.Player` after each frame
+
+        Returns:
+            The `player.Player`, with the numbers of frames `shown` and
+            `dropped`, and the `achieved_fps`.
+        """
+        from .player import Player  # pylint: disable=C0415
+        return Player(self, frames, fps, ahead, workers, drop, loop).play(callback)
+
+    def _gram_changed(self):
+        """Forget any assumption about the display memory contents."""
+        if self.frame_diff is not None:
+            self.frame_diff.reset()
 
     def reset(self):
         """Send a hardware reset signal to the display."""
+        self._gram_changed()
+        self._scroll = None
+        self._registers.clear()
         self._io.set_high(self._io.rst)
         time.sleep(0.01)
         self._io.set_low(self._io.rst)
@@ -212,4 +862,14 @@ class Display:
         """
         if isinstance(level, bool):
             level = int(level)
-        self._io.set_pin_pwm(self._io.bl, level)
+        self._io.backlight.set(level)
+
+    def fade_backlight(self, level, duration, wait=False):
+        """Change the backlight level progressively, in the background.
+
+        Args:
+            level:      final backlight level from 0 to 1
+            duration:   duration of the fade in seconds
+            wait:       whether to return only once the fade is done
+        """
+        self._io.backlight.fade(level, duration, wait)
@@ -0,0 +1,130 @@
+"""Background thread sending frames to the display."""
+import collections
+import threading
+
+BLOCK = 'block'
+DROP_OLDEST = 'drop'
+COALESCE = 'coalesce'
+POLICIES = (BLOCK, DROP_OLDEST, COALESCE)
+
+
+class Flusher:
+    """Send frames from a pool of buffers in a worker thread.
+
+    Frames are copied into a free buffer by `submit`, then sent by the
+    worker, which releases the buffer once the frame has been sent. When no
+    buffer is free, the policy decides what happens:
+
+    - `block`:      wait until the worker releases a buffer
+    - `drop`:       discard the oldest frame which has not been sent yet
+    - `coalesce`:   replace the newest frame which has not been sent yet
+
+    Regions of discarded or replaced frames are merged into the new frame,
+    so that no region is left out of date. If every buffer is being sent,
+    all policies wait.
+    """
+
+    def __init__(self, send, buffers, policy=BLOCK, merge=None):
+        """Start the worker thread.
+
+        Args:
+            send:       function called by the worker with (buffer, regions)
+            buffers:    list of buffers to use
+            policy:     one of `block`, `drop` or `coalesce`
+            merge:      function merging the regions of two frames, regions
+                        being None for full frames
+        """
+        if policy not in POLICIES:
+            raise ValueError("Unexpected policy %r, expected one of %s" % (policy, ', '.join(POLICIES)))
+        self.policy = policy
+        self.dropped = 0
+        self._send = send
+        self._merge = merge or (lambda old, new: None if old is None or new is None else old + new)
+        self._free = list(buffers)
+        self._pending = collections.deque()
+        self._busy = False
+        self._closed = False
+        self._error = None
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='st7789v-flusher', daemon=True)
+        self._thread.start()
+
+    def in_worker(self):
+        """Whether the current thread is the worker thread."""
+        return threading.current_thread() is self._thread
+
+    def submit(self, fill, regions=None):
+        """Queue a frame to be sent.
+
+        Args:
+            fill:       function called with a free buffer to copy the frame into it
+            regions:    regions of the frame to send, None for a full frame
+        """
+        with self._cond:
+            self._check()
+            while not self._free:
+                if self.policy != BLOCK and self._pending:
+                    if self.policy == DROP_OLDEST:
+                        buffer, old_regions = self._pending.popleft()
+                    else:
+                        buffer, old_regions = self._pending.pop()
+                    regions = self._merge(old_regions, regions)
+                    self._free.append(buffer)
+                    self.dropped += 1
+                    break
+                self._cond.wait()
+                self._check()
+            buffer = self._free.pop()
+        try:
+            fill(buffer)
+        except BaseException:
+            with self._cond:
+                self._free.append(buffer)
+            raise
+        with self._cond:
+            self._pending.append((buffer, regions))
+            self._cond.notify_all()
+
+    def flush(self):
+        """Wait until all queued frames have been sent."""
+        with self._cond:
+            while (self._pending or self._busy) and self._error is None:
+                self._cond.wait()
+            self._check()
+
+    def close(self):
+        """Send all queued frames and stop the worker thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if not self.in_worker():
+            self._thread.join()
+        self._check()
+
+    def _check(self):
+        """Raise the last error from the worker thread, if any."""
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                buffer, regions = self._pending.popleft()
+                self._busy = True
+            try:
+                self._send(buffer, regions)
+            except Exception as error:  # pylint: disable=W0703
+                with self._cond:
+                    self._error = error
+                    self._free.extend(pending for pending, _ in self._pending)
+                    self._pending.clear()
+            finally:
+                with self._cond:
+                    self._free.append(buffer)
+                    self._busy = False
+                    self._cond.notify_all()
@@ -0,0 +1,195 @@
+"""Preallocated NumPy framebuffer."""
+from . import colors
+from . import lazy
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+np = lazy.optional_import('numpy')
+
+
+class FrameBuffer:
+    """RGB framebuffer backed by a preallocated NumPy array.
+
+    Pixels are stored as RGBX, which allows a PIL image to share the same
+    memory, so that drawing with PIL writes directly to the array. Output
+    buffers are allocated once per color mode, so converting the buffer
+    does not allocate frame-sized objects.
+    """
+
+    def __init__(self, width, height):
+        """Allocate the framebuffer.
+
+        Args:
+            width:  buffer width
+            height: buffer height
+        """
+        if np is None:
+            raise ImportError("FrameBuffer requires NumPy")
+        self.width = width
+        self.height = height
+        self.array = np.zeros((height, width, 4), dtype=np.uint8)
+        self.rgb = self.array[..., :3]
+        self.shared = False
+        self.image = self._shared_image()
+        # room for a flattened RGB copy plus temporary values
+        self._scratch = np.empty(width * height * 4 + 1, dtype=np.uint8)
+        self._out = {}
+
+    def _shared_image(self):
+        """Create a PIL image sharing the array's memory, if possible."""
+        if Image is None:
+            return None
+        image = Image.frombuffer('RGBX', (self.width, self.height), self.array, 'raw', 'RGBX', 0, 1)
+        # frombuffer maps the array, but marks the image read-only to avoid
+        # modifying it; the array is writable so drawing to it is safe
+        image.readonly = 0
+        image.putpixel((0, 0), (1, 2, 3))
+        self.shared = tuple(self.array[0, 0, :3]) == (1, 2, 3)
+        self.array[0, 0] = 0
+        if not self.shared:
+            image = Image.new('RGBX', (self.width, self.height))
+        return image
+
+    def sync_from_image(self):
+        """Copy the PIL image to the array, if they do not share memory."""
+        if self.image is not None and not self.shared:
+            self.array[...] = np.asarray(self.image)
+
+    def convert(self, color_mode, left=0, top=0, right=None, bottom=None, dither=False):
+        """Convert a region of the buffer to a color mode.
+
+        Args:
+            color_mode: color mode description, from `colors.MODES`
+            left:       left bound (included)
+            top:        top bound (included)
+            right:      right bound (excluded), defaults to the buffer width
+            bottom:     bottom bound (excluded), defaults to the buffer height
+            dither:     Whether to apply ordered dithering, if the color mode supports it
+
+        Returns:
+            A memoryview of a preallocated buffer holding the converted bytes,
+            valid until the next conversion to the same color mode.
+        """
+        right = self.width if right is None else right
+        bottom = self.height if bottom is None else bottom
+        out = self._out.get(color_mode['id'])
+        if out is None:
+            out = self._out[color_mode['id']] = bytearray((self.width * self.height + 1) * color_mode['bytes2'] // 2)
+        region = self.rgb[top:bottom, left:right]
+        if dither and color_mode['dither'] is not None:
+            return color_mode['dither'](region, out, self._scratch, left, top)
+        if color_mode['bytes2'] % 2:
+            # RGB 4-4-4 packs pixels in pairs across rows, flatten the region first
+            count = (right - left) * (bottom - top)
+            flat = self._scratch[:count * 3].reshape(region.shape)
+            colors.copy_rgb(flat, region)
+            return color_mode['array'](flat.reshape(count, 3), out, self._scratch[count * 3:])
+        return color_mode['array'](region, out, self._scratch)
+
+
+class PaletteBuffer:
+    """Indexed-color framebuffer backed by a preallocated NumPy array.
+
+    Pixels are stored as one palette index per byte, with a PIL "P" image
+    sharing the same memory. The palette is converted once to the native
+    bytes of the color mode, so converting the buffer is a table lookup.
+    The table is only rebuilt when the palette or the color mode changes.
+    """
+
+    def __init__(self, width, height, palette=None):
+        """Allocate the framebuffer.
+
+        Args:
+            width:      buffer width
+            height:     buffer height
+            palette:    flat sequence of R, G, B values of up to 256 colors
+        """
+        if np is None:
+            raise ImportError("PaletteBuffer requires NumPy")
+        self.width = width
+        self.height = height
+        self.array = np.zeros((height, width), dtype=np.uint8)
+        self.shared = False
+        self._palette = bytes(768)
+        self.image = self._shared_image()
+        if palette is not None:
+            self.palette = palette
+        # room for a flattened copy of the indices plus pairs of indices
+        self._scratch = np.empty(width * height * 2 + 2, dtype=np.uint8)
+        self._out = {}
+        self._lut = {}
+
+    def _shared_image(self):
+        """Create a PIL image sharing the array's memory, if possible."""
+        if Image is None:
+            return None
+        image = Image.frombuffer('P', (self.width, self.height), self.array, 'raw', 'P', 0, 1)
+        image.readonly = 0
+        image.putpalette(self._palette)
+        image.putpixel((0, 0), 1)
+        self.shared = self.array[0, 0] == 1
+        self.array[0, 0] = 0
+        if not self.shared:
+            image = Image.new('P', (self.width, self.height))
+            image.putpalette(self._palette)
+        return image
+
+    @property
+    def palette(self):
+        """Palette as 768 bytes of R, G, B values, following the PIL image's palette."""
+        if self.image is not None:
+            palette = bytes(self.image.getpalette() or b'')[:768]
+            self._palette = palette + bytes(768 - len(palette))
+        return self._palette
+
+    @palette.setter
+    def palette(self, palette):
+        palette = bytes(palette)[:768]
+        self._palette = palette + bytes(768 - len(palette))
+        if self.image is not None:
+            self.image.putpalette(self._palette)
+
+    def sync_from_image(self):
+        """Copy the PIL image to the array, if they do not share memory."""
+        if self.image is not None and not self.shared:
+            self.array[...] = np.asarray(self.image)
+
+    def lut(self, color_mode):
+        """Get the table of native bytes of the palette for a color mode, see `colors.palette_lut`."""
+        palette = self.palette
+        cached = self._lut.get(color_mode['id'])
+        if cached is None or cached[0] != palette:
+            cached = self._lut[color_mode['id']] = (palette, colors.palette_lut(palette, color_mode))
+        return cached[1]
+
+    def convert(self, color_mode, left=0, top=0, right=None, bottom=None, dither=False):  # pylint: disable=W0613
+        """Convert a region of the buffer to a color mode.
+
+        Args:
+            color_mode: color mode description, from `colors.MODES`
+            left:       left bound (included)
+            top:        top bound (included)
+            right:      right bound (excluded), defaults to the buffer width
+            bottom:     bottom bound (excluded), defaults to the buffer height
+            dither:     unused, palette colors are converted as is
+
+        Returns:
+            A memoryview of a preallocated buffer holding the converted bytes,
+            valid until the next conversion to the same color mode.
+        """
+        right = self.width if right is None else right
+        bottom = self.height if bottom is None else bottom
+        out = self._out.get(color_mode['id'])
+        if out is None:
+            out = self._out[color_mode['id']] = bytearray((self.width * self.height + 1) * color_mode['bytes2'] // 2)
+        lut = self.lut(color_mode)
+        region = self.array[top:bottom, left:right]
+        if color_mode['bytes2'] % 2:
+            # RGB 4-4-4 packs pixels in pairs across rows, flatten the region first
+            count = region.size
+            flat = self._scratch[:count]
+            np.copyto(flat.reshape(region.shape), region)
+            return colors.indices_to_native_np(flat, lut, out, self._scratch[count + count % 2:])
+        return colors.indices_to_native_np(region, lut, out)
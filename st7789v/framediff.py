@@ -0,0 +1,139 @@
+"""Tile-based frame differencing.
+
+Frames are compared in their native (converted) form against a shadow copy
+of the display memory, so that only the tiles which changed are sent.
+"""
+from . import lazy
+
+np = lazy.optional_import('numpy')
+
+
+class FrameDiff:
+    """Track display memory contents and compute changed regions."""
+
+    def __init__(self, tile_width=16, tile_height=16):
+        """Define the tile size.
+
+        Args:
+            tile_width:     tile width in pixels, must be even (RGB 4-4-4 packs 2 pixels in 3 bytes)
+            tile_height:    tile height in pixels
+        """
+        if tile_width <= 0 or tile_width % 2 or tile_height <= 0:
+            raise ValueError("Tile width must be a positive even number, and tile height positive")
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self._shadow = None
+        self._shape = None
+        self.last_sent = 0
+        self.last_saved = 0
+        self.total_sent = 0
+        self.total_saved = 0
+
+    def reset(self):
+        """Forget the display memory contents, the next frame is sent in full."""
+        self._shadow = None
+        self._shape = None
+
+    def diff(self, data, width, height, bytes2):
+        """Compare a frame with the previous one and store it.
+
+        Args:
+            data:   frame in native format
+            width:  frame width
+            height: frame height
+            bytes2: number of bytes per 2 pixels
+
+        Returns:
+            A list of (left, top, right, bottom, data) tuples to send.
+        """
+        row_bytes = width * bytes2 // 2
+        if len(data) != row_bytes * height:
+            raise ValueError("Expected %d bytes of frame data, got %d" % (row_bytes * height, len(data)))
+        shape = (width, height, bytes2)
+        if self._shape != shape:
+            self._shape = shape
+            self._store(data)
+            spans = [(0, 0, width, height)]
+        elif np is not None:
+            spans = self._diff_np(data, width, height, row_bytes, bytes2)
+        else:
+            spans = self._diff_py(data, width, height, row_bytes, bytes2)
+
+        view = memoryview(self._shadow)
+        result = []
+        for left, top, right, bottom in spans:
+            start, end = left * bytes2 // 2, right * bytes2 // 2
+            if start == 0 and end == row_bytes:
+                chunk = view[top * row_bytes:bottom * row_bytes]
+            else:
+                chunk = b''.join(view[row * row_bytes + start:row * row_bytes + end]
+                                 for row in range(top, bottom))
+            result.append((left, top, right, bottom, chunk))
+        self.last_sent = sum(len(span[4]) for span in result)
+        self.last_saved = len(data) - self.last_sent
+        self.total_sent += self.last_sent
+        self.total_saved += self.last_saved
+        return result
+
+    def _store(self, data):
+        if np is not None:
+            self._shadow = np.frombuffer(data, dtype=np.uint8).copy()
+        else:
+            self._shadow = bytearray(data)
+
+    def _diff_np(self, data, width, height, row_bytes, bytes2):
+        current = np.frombuffer(data, dtype=np.uint8).reshape(height, row_bytes)
+        shadow = self._shadow.reshape(height, row_bytes)
+        changed = current != shadow
+        rows = np.arange(0, height, self.tile_height)
+        cols = np.arange(0, row_bytes, self.tile_width * bytes2 // 2)
+        dirty = np.logical_or.reduceat(np.logical_or.reduceat(changed, rows, axis=0), cols, axis=1)
+        shadow[...] = current
+        return self._spans(dirty.tolist(), width, height)
+
+    def _diff_py(self, data, width, height, row_bytes, bytes2):
+        tile_bytes = self.tile_width * bytes2 // 2
+        data = memoryview(data)
+        shadow = memoryview(self._shadow)
+        dirty = []
+        for top in range(0, height, self.tile_height):
+            bottom = min(height, top + self.tile_height)
+            dirty_row = []
+            for start in range(0, row_bytes, tile_bytes):
+                end = min(row_bytes, start + tile_bytes)
+                dirty_row.append(any(data[row * row_bytes + start:row * row_bytes + end]
+                                     != shadow[row * row_bytes + start:row * row_bytes + end]
+                                     for row in range(top, bottom)))
+            dirty.append(dirty_row)
+        self._shadow[:] = data
+        return self._spans(dirty, width, height)
+
+    def _spans(self, dirty, width, height):
+        """Coalesce dirty tiles into rectangles.
+
+        Horizontally adjacent tiles are merged into spans, and spans covering
+        the same columns in consecutive tile rows are merged together.
+        """
+        spans = []
+        open_spans = {}
+        for tile_y, dirty_row in enumerate(dirty):
+            top, bottom = tile_y * self.tile_height, min(height, (tile_y + 1) * self.tile_height)
+            row_spans = {}
+            tile_x = 0
+            while tile_x < len(dirty_row):
+                if not dirty_row[tile_x]:
+                    tile_x += 1
+                    continue
+                start = tile_x
+                while tile_x < len(dirty_row) and dirty_row[tile_x]:
+                    tile_x += 1
+                left, right = start * self.tile_width, min(width, tile_x * self.tile_width)
+                span_top = open_spans[(left, right)] if (left, right) in open_spans else top
+                row_spans[(left, right)] = span_top
+            for (left, right), span_top in open_spans.items():
+                if (left, right) not in row_spans:
+                    spans.append((left, span_top, right, top))
+            open_spans = row_spans
+        for (left, right), span_top in open_spans.items():
+            spans.append((left, span_top, right, height))
+        return spans
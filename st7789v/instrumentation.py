@@ -0,0 +1,163 @@
+"""Instrumentation of commands, transfers, conversions and frames.
+
+Events are reported to sinks as `record(kind, name, value, size)` calls:
+
+- `command`:    a command was sent, `name` is its name and `size` its data length
+- `convert`:    pixel data was converted, `value` is the duration and `size` the output length
+- `spi`:        data was written to the SPI bus, `value` is the duration and `size` the length
+- `transfer`:   a command and its data were sent, `value` is the duration,
+                including GPIO toggling and SPI writes
+- `pin`:        a pin was set, `value` is the duration
+- `frame`:      a frame was drawn, `value` is its latency
+"""
+import logging
+import time
+
+# Upper bounds of the frame latency histogram buckets, in milliseconds
+LATENCY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, float('inf'))
+
+
+class Instrumentation:
+    """Dispatch instrumentation events to sinks."""
+
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self, *sinks):
+        self.sinks = list(sinks)
+
+    def record(self, kind, name=None, value=0.0, size=0):
+        """Report an event to all sinks."""
+        for sink in self.sinks:
+            sink.record(kind, name, value, size)
+
+    def command(self, name, size):
+        """Report a command."""
+        self.record('command', name, 0.0, size)
+
+    def convert(self, start, size):
+        """Report a conversion which started at `start` (from `clock`)."""
+        self.record('convert', None, self.clock() - start, size)
+
+    def frame(self, start):
+        """Report a frame which started at `start` (from `clock`)."""
+        self.record('frame', None, self.clock() - start, 0)
+
+
+class Stats:
+    """In-memory sink aggregating events."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget all recorded events."""
+        self.commands = {}
+        self.command_bytes = {}
+        self.times = {'convert': 0.0, 'spi': 0.0, 'transfer': 0.0, 'pin': 0.0}
+        self.counts = {'convert': 0, 'spi': 0, 'transfer': 0, 'pin': 0}
+        self.spi_bytes = 0
+        self.convert_bytes = 0
+        self.frames = 0
+        self.histogram = [0] * len(LATENCY_BUCKETS)
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.first_frame = None
+        self.last_frame = None
+
+    def record(self, kind, name, value, size):
+        """Aggregate an event."""
+        if kind == 'command':
+            self.commands[name] = self.commands.get(name, 0) + 1
+            self.command_bytes[name] = self.command_bytes.get(name, 0) + size
+        elif kind == 'frame':
+            now = time.monotonic()
+            if self.first_frame is None:
+                self.first_frame = now
+            self.last_frame = now
+            self.frames += 1
+            self.latency_total += value
+            self.latency_max = max(self.latency_max, value)
+            milliseconds = value * 1000
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if milliseconds <= bound:
+                    self.histogram[i] += 1
+                    break
+        elif kind in self.times:
+            self.times[kind] += value
+            self.counts[kind] += 1
+            if kind == 'spi':
+                self.spi_bytes += size
+            elif kind == 'convert':
+                self.convert_bytes += size
+
+    @property
+    def fps(self):
+        """Average frame rate between the first and last frames."""
+        if self.frames < 2 or self.last_frame == self.first_frame:
+            return 0.0
+        return (self.frames - 1) / (self.last_frame - self.first_frame)
+
+    def snapshot(self):
+        """Get the aggregated statistics as a dictionary."""
+        return {
+            'commands': dict(self.commands),
+            'command_bytes': dict(self.command_bytes),
+            'times': dict(self.times),
+            'counts': dict(self.counts),
+            # time spent sending commands besides SPI writes, mostly GPIO toggling
+            'overhead_time': max(0.0, self.times['transfer'] - self.times['spi']),
+            'spi_bytes': self.spi_bytes,
+            'convert_bytes': self.convert_bytes,
+            'frames': self.frames,
+            'fps': self.fps,
+            'latency_mean': self.latency_total / self.frames if self.frames else 0.0,
+            'latency_max': self.latency_max,
+            'latency_histogram': dict(zip(LATENCY_BUCKETS, self.histogram)),
+        }
+
+
+class CallbackSink:
+    """Sink calling a function with (kind, name, value, size) for each event."""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def record(self, kind, name, value, size):
+        """Forward an event to the callback."""
+        self.callback(kind, name, value, size)
+
+
+class LogSink:
+    """Sink logging a summary line periodically."""
+
+    def __init__(self, logger='st7789v', interval=10.0, level=logging.INFO):
+        """Create the sink.
+
+        Args:
+            logger:     logger or logger name
+            interval:   minimum time between two lines, in seconds
+            level:      logging level
+        """
+        self.log = logging.getLogger(logger) if isinstance(logger, str) else logger
+        self.interval = interval
+        self.level = level
+        self.stats = Stats()
+        self._last = time.monotonic()
+
+    def record(self, kind, name, value, size):
+        """Aggregate an event and log a summary if the interval has elapsed."""
+        self.stats.record(kind, name, value, size)
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self.emit(now - self._last)
+            self._last = now
+
+    def emit(self, elapsed):
+        """Log a summary of the events since the last line."""
+        stats = self.stats.snapshot()
+        self.log.log(self.level, '%d frames (%.1f fps, %.1f ms mean, %.1f ms max), %d commands, '
+                     '%.1f kB sent, convert %.1f ms, SPI %.1f ms, overhead %.1f ms over %.1f s',
+                     stats['frames'], stats['fps'], stats['latency_mean'] * 1000, stats['latency_max'] * 1000,
+                     sum(stats['commands'].values()), stats['spi_bytes'] / 1000, stats['times']['convert'] * 1000,
+                     stats['times']['spi'] * 1000, stats['overhead_time'] * 1000, elapsed)
+        self.stats.reset()
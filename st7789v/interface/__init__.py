@@ -1,4 +1,94 @@
-"""Generic IO and SPI interface."""
+"""Generic IO and SPI interface.
+
+Backends are imported when first used, so that importing one does not need
+the dependencies of the others (e.g. `Dummy` does not need `RPi.GPIO`).
+Other packages can provide backends with entry points in the
+`st7789v.interface` group, which are then available from `get_backend`.
+"""
+import importlib
+import sys
 from .io_wrapper import IOWrapper
-from .raspberry import RaspberryPi
-from .dummy import Dummy
+
+ENTRY_POINT_GROUP = 'st7789v.interface'
+
+# Backends by name, as (module, class name) or as the class once imported
+BACKENDS = {
+    'RaspberryPi': ('.raspberry', 'RaspberryPi'),
+    'Dummy': ('.dummy', 'Dummy'),
+    'Counting': ('.counting', 'Counting'),
+    'Emulator': ('.emulator', 'Emulator'),
+}
+
+
+def register_backend(name, backend):
+    """Make a backend available from `get_backend`.
+
+    Args:
+        name:       backend name
+        backend:    IOWrapper subclass, or 'module:class' string to import it
+                    when first used
+    """
+    if isinstance(backend, str):
+        module, _, attr = backend.partition(':')
+        backend = (module, attr)
+    BACKENDS[name] = backend
+
+
+def _entry_points():
+    """Backends provided by other packages, as entry points."""
+    try:
+        from importlib.metadata import entry_points  # pylint: disable=C0415
+    except ImportError:
+        return []
+    points = entry_points()
+    if hasattr(points, 'select'):
+        return list(points.select(group=ENTRY_POINT_GROUP))
+    return list(points.get(ENTRY_POINT_GROUP, []))
+
+
+def available_backends():
+    """Names of the built-in, registered and entry point backends."""
+    return sorted(set(BACKENDS) | {point.name for point in _entry_points()})
+
+
+def get_backend(name):
+    """Get a backend class, importing it if needed.
+
+    Args:
+        name:   backend name, see `available_backends`
+
+    Raises:
+        ImportError:    if the backend or its dependencies cannot be imported
+        KeyError:       if there is no such backend
+    """
+    backend = BACKENDS.get(name)
+    if backend is None:
+        for point in _entry_points():
+            if point.name == name:
+                backend = BACKENDS[name] = point.load()
+                return backend
+        raise KeyError("Unknown interface backend %r, expected one of %s" % (name, ', '.join(available_backends())))
+    if isinstance(backend, tuple):
+        module, attr = backend
+        backend = getattr(importlib.import_module(module, __name__), attr)
+        BACKENDS[name] = backend
+    return backend
+
+
+def __getattr__(name):
+    """Import built-in backends when first used."""
+    if name in BACKENDS:
+        try:
+            return get_backend(name)
+        except ImportError as error:
+            raise AttributeError("Backend %s is not available: %s" % (name, error)) from error
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+if sys.version_info < (3, 7):
+    # module-level __getattr__ is not supported
+    for _name in list(BACKENDS):
+        try:
+            globals()[_name] = get_backend(_name)
+        except ImportError:
+            pass
@@ -0,0 +1,203 @@
+"""Backlight brightness controllers."""
+import os
+import threading
+import time
+
+# Root of the kernel PWM class in sysfs
+PWM_ROOT = '/sys/class/pwm'
+# Hardware PWM (chip, channel) of the Raspberry Pi pins, in BCM numbering,
+# available once enabled with e.g. `dtoverlay=pwm,pin=18,func=2`
+PWM_PINS = {12: (0, 0), 13: (0, 1), 18: (0, 0), 19: (0, 1)}
+
+
+def _clamp(value):
+    return min(1.0, max(0.0, float(value)))
+
+
+class Backlight:
+    """Abstract backlight brightness controller.
+
+    Fades run on a thread which sleeps until each step is due, so they do not
+    keep the CPU busy and can be cancelled by any later `set` or `fade`.
+    """
+    # Number of brightness updates per second during fades
+    fade_rate = 100
+
+    def __init__(self):
+        self._value = 1.0
+        self._lock = threading.Lock()
+        self._fade = None
+
+    @property
+    def value(self):
+        """Current brightness, from 0 to 1."""
+        return self._value
+
+    def set(self, value):
+        """Set the brightness, stopping any fade in progress.
+
+        Args:
+            value:  brightness from 0 to 1
+        """
+        with self._lock:
+            self._stop_fade()
+            self._apply(_clamp(value))
+
+    def fade(self, value, duration, wait=False):
+        """Change the brightness progressively, in the background.
+
+        Args:
+            value:      final brightness from 0 to 1
+            duration:   duration of the fade in seconds
+            wait:       whether to return only once the fade is done
+        """
+        value = _clamp(value)
+        with self._lock:
+            self._stop_fade()
+            if duration <= 0:
+                self._apply(value)
+                return
+            stop = threading.Event()
+            thread = threading.Thread(target=self._run_fade, args=(self._value, value, duration, stop), daemon=True)
+            self._fade = (thread, stop)
+            thread.start()
+        if wait:
+            thread.join()
+
+    def wait(self, timeout=None):
+        """Wait for the fade in progress, if any, to finish.
+
+        Returns:
+            Whether no fade is in progress anymore.
+        """
+        fade = self._fade
+        if fade is None:
+            return True
+        fade[0].join(timeout)
+        return not fade[0].is_alive()
+
+    def stop(self):
+        """Stop any fade in progress, at its current brightness."""
+        with self._lock:
+            self._stop_fade()
+
+    def close(self):
+        """Stop any fade in progress and release the controller."""
+        self.stop()
+
+    def _stop_fade(self):
+        """Cancel the fade in progress, the lock must be held."""
+        if self._fade is not None:
+            self._fade[1].set()
+            self._fade = None
+
+    def _run_fade(self, begin, end, duration, stop):
+        steps = max(1, int(duration * self.fade_rate))
+        start = time.monotonic()
+        for step in range(1, steps + 1):
+            if stop.wait(max(0, start + duration * step / steps - time.monotonic())):
+                return
+            with self._lock:
+                # checked again with the lock held, a `set` may have happened while waiting for it
+                if stop.is_set():
+                    return
+                self._apply(begin + (end - begin) * step / steps)
+                if step == steps:
+                    self._fade = None
+
+    def _apply(self, value):
+        self._write(value)
+        self._value = value
+
+    def _write(self, value):
+        """Output a brightness from 0 to 1."""
+        raise NotImplementedError
+
+
+class PinBacklight(Backlight):
+    """Backlight driven with `IOWrapper.set_pin_pwm` on the backlight pin."""
+
+    def __init__(self, io):
+        """Create the controller.
+
+        Args:
+            io: IOWrapper whose `bl` pin drives the backlight
+        """
+        super().__init__()
+        self._io = io
+
+    def _write(self, value):
+        self._io.set_pin_pwm(self._io.bl, value)
+
+
+class SysfsPWM(Backlight):
+    """Backlight driven by a hardware PWM channel, through the kernel sysfs interface.
+
+    The signal is generated by the PWM peripheral, so it is free of the
+    jitter of software PWM and costs no CPU time once set.
+    """
+
+    def __init__(self, chip=0, channel=0, frequency=1000, root=PWM_ROOT, timeout=1.0):
+        """Export and enable the PWM channel, at full brightness.
+
+        Args:
+            chip:       PWM chip number (`pwmchipN`)
+            channel:    channel number on the chip
+            frequency:  PWM frequency in Hz
+            root:       sysfs PWM class directory
+            timeout:    maximum time to wait for an exported channel to be
+                        writable, as its permissions may be set by udev
+        """
+        super().__init__()
+        self.chip_path = os.path.join(root, 'pwmchip%d' % chip)
+        self.path = os.path.join(self.chip_path, 'pwm%d' % channel)
+        self._channel = channel
+        self._exported = False
+        if not os.path.isdir(self.path):
+            self._write_file(os.path.join(self.chip_path, 'export'), channel)
+            self._exported = True
+            deadline = time.monotonic() + timeout
+            while not os.access(os.path.join(self.path, 'duty_cycle'), os.W_OK):
+                if time.monotonic() > deadline:
+                    raise IOError("PWM channel %s was not exported" % self.path)
+                time.sleep(0.01)
+        self.period = int(1e9 / frequency)
+        # the duty cycle must never exceed the period, even while changing it
+        self._write_file(os.path.join(self.path, 'duty_cycle'), 0)
+        self._write_file(os.path.join(self.path, 'period'), self.period)
+        self._duty_cycle = os.open(os.path.join(self.path, 'duty_cycle'), os.O_WRONLY)
+        self._write(1.0)
+        self._write_file(os.path.join(self.path, 'enable'), 1)
+
+    @staticmethod
+    def available(chip=0, channel=0, root=PWM_ROOT):
+        """Whether a PWM channel exists in sysfs."""
+        try:
+            with open(os.path.join(root, 'pwmchip%d' % chip, 'npwm')) as file:
+                return channel < int(file.read().strip())
+        except (OSError, ValueError):
+            return False
+
+    @staticmethod
+    def exported(chip=0, channel=0, root=PWM_ROOT):
+        """Whether a PWM channel is already exported in sysfs, i.e. set up for use."""
+        return os.path.isdir(os.path.join(root, 'pwmchip%d' % chip, 'pwm%d' % channel))
+
+    @staticmethod
+    def _write_file(path, value):
+        with open(path, 'w') as file:
+            file.write('%d' % value)
+
+    def _write(self, value):
+        os.pwrite(self._duty_cycle, b'%d\n' % int(round(self.period * value)), 0)
+
+    def close(self):
+        """Stop any fade, then disable the channel and unexport it if it was exported here."""
+        self.stop()
+        if self._duty_cycle is None:
+            return
+        os.close(self._duty_cycle)
+        self._duty_cycle = None
+        self._write_file(os.path.join(self.path, 'enable'), 0)
+        if self._exported:
+            self._write_file(os.path.join(self.chip_path, 'unexport'), self._channel)
@@ -0,0 +1,37 @@
+"""No-op implementation of IOWrapper counting operations."""
+from .io_wrapper import IOWrapper
+
+
+class Counting(IOWrapper):
+    """IO wrapper discarding all data, while counting operations.
+
+    Useful to measure the cost of the Python side of the pipeline.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.reset_counters()
+
+    def reset_counters(self):
+        """Set all counters to zero."""
+        self.pin_writes = 0
+        self.spi_writes = 0
+        self.spi_bytes = 0
+        self.spi_reads = 0
+
+    def set_pin(self, pin: int, state: bool):
+        self.pin_writes += 1
+
+    def set_pin_pwm(self, pin: int, value: float):
+        self.pin_writes += 1
+
+    def wait_edge(self, pin: int, timeout: float = None):
+        return True
+
+    def spi_write(self, data: bytes):
+        self.spi_writes += 1
+        self.spi_bytes += len(data)
+
+    def spi_read(self, size: int):
+        self.spi_reads += 1
+        return bytes(size)
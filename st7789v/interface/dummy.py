@@ -1,14 +1,24 @@
 """Dummy implementation of IOWrapper."""
 import logging
+import time
 from .io_wrapper import IOWrapper
 
 
 class Dummy(IOWrapper):
     """Dummy IO wrapper."""
 
-    def __init__(self, logger='dummy_io', handler=None, **kwargs):
+    def __init__(self, logger='dummy_io', handler=None, te_rate=60.0, **kwargs):
+        """Create a dummy IO wrapper logging all operations.
+
+        Args:
+            logger:     logger name
+            handler:    logging handler, defaults to logging to the console
+            te_rate:    frequency of the simulated tearing effect signal, in Hz
+            **kwargs:   pin numbers, see `IOWrapper`
+        """
         super().__init__(**kwargs)
-        self._pin_map = {self.bl: 'BL', self.dc: 'DC', self.cs: 'CD', self.rst: 'RST'}
+        self._pin_map = {self.bl: 'BL', self.dc: 'DC', self.cs: 'CD', self.rst: 'RST', self.te: 'TE'}
+        self.te_rate = te_rate
         self.log = logging.getLogger(logger)
         self.log.setLevel(logging.DEBUG)
         if handler:
@@ -28,6 +38,18 @@ class Dummy(IOWrapper):
     def set_pin_pwm(self, pin: int, value: float):
         self.log.debug('Set pin %s to %f', self._pin_map.get(pin, str(pin)), value)
 
+    def wait_edge(self, pin: int, timeout: float = None):
+        # simulated TE signal, rising at a fixed rate
+        period = 1 / self.te_rate
+        now = time.monotonic()
+        delay = period - now % period
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            return False
+        time.sleep(delay)
+        self.log.debug('Edge on pin %s', self._pin_map.get(pin, str(pin)))
+        return True
+
     def spi_write(self, data: bytes):
         self.log.debug('Send data: %s', data.hex())
 
@@ -0,0 +1,276 @@
+"""Software emulation of an ST7789V display, as an IOWrapper."""
+import time
+import numpy as np
+from .io_wrapper import IOWrapper
+from .. import commands
+
+RAMWR, RAMRD, WRMEMC, RDMEMC = 0x2C, 0x2E, 0x3C, 0x3E
+
+
+def _expand(values, bits):
+    """Expand `bits`-bit values stored in the high bits of uint8 values to 8 bits."""
+    return values | values >> bits
+
+
+class Emulator(IOWrapper):
+    """IO wrapper emulating an ST7789V display in memory.
+
+    The DC/CS/SPI stream is decoded as the controller would, and the display
+    memory (GRAM) is kept as a NumPy array of 8-bit RGB values. MADCTL,
+    CASET/RASET windows, COLMOD, RAMWR/WRMEMC, RAMRD/RDMEMC, vertical scrolling,
+    inversion and sleep/display on are modeled.
+    """
+
+    def __init__(self, width=240, height=320, refresh_rate=60.0, inverted_panel=True, **kwargs):
+        """Create the emulated display.
+
+        Args:
+            width:          physical width of the display memory
+            height:         physical height of the display memory
+            refresh_rate:   refresh rate used for the TE signal and scanline, in Hz
+            inverted_panel: Whether the panel shows normal colors when inversion
+                            is on (INVON), as is the case of IPS panels.
+            **kwargs:       pin numbers, see `IOWrapper`
+        """
+        super().__init__(**kwargs)
+        self.gram_width = width
+        self.gram_height = height
+        self.refresh_rate = refresh_rate
+        self.inverted_panel = inverted_panel
+        self.gram = np.zeros((height, width, 3), dtype=np.uint8)
+        self.stats = {'commands': {}, 'bytes': 0, 'pixels': 0}
+        self._pins = {}
+        self._window_cache = None
+        self._hardware_reset()
+
+    def _hardware_reset(self):
+        """Reset registers to their default values; GRAM is kept."""
+        self.registers = {
+            'MADCTL': 0x00, 'COLMOD': 0x66, 'CASET': (0, self.gram_width - 1),
+            'RASET': (0, self.gram_height - 1), 'VSCRDEF': (0, self.gram_height, 0),
+            'VSCSAD': 0, 'INV': False, 'SLEEP': True, 'DISPLAY': False, 'TE': None,
+        }
+        self._command = None
+        self._params = bytearray()
+        self._pending = b''
+        self._pointer = 0
+        self._read_pointer = 0
+
+    def set_pin(self, pin: int, state: bool):
+        previous = self._pins.get(pin)
+        self._pins[pin] = bool(state)
+        if pin == self.rst and previous and not state:
+            self._hardware_reset()
+        elif pin == self.cs and state:
+            self._end_transfer()
+
+    def set_pin_pwm(self, pin: int, value: float):
+        self._pins[pin] = value
+
+    def wait_edge(self, pin: int, timeout: float = None):
+        period = 1 / self.refresh_rate
+        delay = period - time.monotonic() % period
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            return False
+        time.sleep(delay)
+        return True
+
+    def send_command(self, command: bytes, data=None, hold_cs=False):
+        # skip the pin toggling, which has no effect besides delimiting commands
+        self._end_transfer()
+        self._start_command(command[0])
+        if data:
+            self._write_data(memoryview(data).cast('B'))
+
+    def spi_write(self, data: bytes):
+        if self._pins.get(self.cs, True):
+            return
+        data = memoryview(data).cast('B')
+        if self._pins.get(self.dc, False):
+            self._write_data(data)
+        else:
+            for cmd in data:
+                self._end_transfer()
+                self._start_command(cmd)
+
+    def spi_read(self, size: int):
+        cmd = self._command
+        if cmd in (RAMRD, RDMEMC):
+            if cmd == RAMRD and self._read_pointer == 0:
+                # the first byte read after RAMRD is a dummy byte
+                return bytes(1) + self._read_pixels(size - 1)
+            return self._read_pixels(size)
+        values = {
+            0x0B: [0, self.registers['MADCTL']],
+            0x0C: [0, self.registers['COLMOD']],
+            0x45: [0, self.scanline >> 8, self.scanline & 0xff],
+        }.get(cmd, [])
+        return bytes(values[:size]) + bytes(max(0, size - len(values)))
+
+    @property
+    def scanline(self):
+        """Line currently refreshed, computed from the refresh rate."""
+        period = 1 / self.refresh_rate
+        return int(time.monotonic() % period / period * self.gram_height)
+
+    def _start_command(self, cmd):
+        self._command = cmd
+        self._params = bytearray()
+        self.stats['commands'][cmd] = self.stats['commands'].get(cmd, 0) + 1
+        if cmd == RAMWR:
+            self._pointer = 0
+            self._pending = b''
+        elif cmd == RAMRD:
+            self._read_pointer = 0
+        elif cmd in (0x01,):
+            self._hardware_reset()
+        elif cmd in (0x10, 0x11):
+            self.registers['SLEEP'] = cmd == 0x10
+        elif cmd in (0x20, 0x21):
+            self.registers['INV'] = cmd == 0x21
+        elif cmd in (0x28, 0x29):
+            self.registers['DISPLAY'] = cmd == 0x29
+        elif cmd == 0x34:
+            self.registers['TE'] = None
+
+    def _end_transfer(self):
+        """Complete a RGB 4-4-4 pixel whose last 4 bits were not sent."""
+        if self._command in (RAMWR, WRMEMC) and len(self._pending) == 2 and self.registers['COLMOD'] & 0x07 == 0x03:
+            self._write_pixels(self._pending + b'\x00', 1)
+            self._pending = b''
+
+    def _write_data(self, data):
+        self.stats['bytes'] += len(data)
+        if self._command in (RAMWR, WRMEMC):
+            self._write_pixel_data(data)
+            return
+        info = commands.by_id.get(self._command)
+        if info is None or info['wrx'] <= 0:
+            return
+        self._params += data
+        if len(self._params) >= info['wrx']:
+            self._apply(self._command, bytes(self._params[:info['wrx']]))
+            self._params = bytearray()
+
+    def _apply(self, cmd, params):
+        """Apply a command once all its parameters are received."""
+        words = [int.from_bytes(params[i:i+2], 'big') for i in range(0, len(params) - 1, 2)]
+        if cmd == 0x2A:
+            self.registers['CASET'] = tuple(words)
+        elif cmd == 0x2B:
+            self.registers['RASET'] = tuple(words)
+        elif cmd == 0x36:
+            self.registers['MADCTL'] = params[0]
+        elif cmd == 0x3A:
+            self.registers['COLMOD'] = params[0]
+        elif cmd == 0x33:
+            self.registers['VSCRDEF'] = tuple(words)
+        elif cmd == 0x37:
+            self.registers['VSCSAD'] = words[0]
+        elif cmd == 0x35:
+            self.registers['TE'] = params[0]
+
+    def _unit(self):
+        """(bytes, pixels) of the smallest group of pixels in the current color mode."""
+        return {0x03: (3, 2), 0x05: (2, 1)}.get(self.registers['COLMOD'] & 0x07, (3, 1))
+
+    def _write_pixel_data(self, data):
+        unit_bytes, unit_pixels = self._unit()
+        if self._pending:
+            data = self._pending + bytes(data)
+        usable = len(data) - len(data) % unit_bytes
+        self._pending = bytes(data[usable:])
+        if usable:
+            self._write_pixels(data[:usable], usable // unit_bytes * unit_pixels)
+
+    def _decode(self, data, count):
+        """Decode pixel data in the current color mode to an (N, 3) RGB array."""
+        raw = np.frombuffer(data, dtype=np.uint8)
+        mode = self.registers['COLMOD'] & 0x07
+        if mode == 0x05:
+            pairs = raw.reshape(-1, 2)
+            high, low = pairs[:, 0], pairs[:, 1]
+            rgb = np.empty((len(pairs), 3), dtype=np.uint8)
+            rgb[:, 0] = _expand(high & 0xf8, 5)
+            rgb[:, 1] = _expand((high << 5) | (low >> 3 & 0x1c), 6)
+            rgb[:, 2] = _expand(low << 3, 5)
+        elif mode == 0x03:
+            nibbles = np.empty(len(raw) * 2, dtype=np.uint8)
+            nibbles[0::2] = raw & 0xf0
+            nibbles[1::2] = raw << 4
+            rgb = (nibbles | nibbles >> 4).reshape(-1, 3)
+        else:
+            rgb = _expand(raw & 0xfc, 6).reshape(-1, 3)
+        return rgb[:count]
+
+    def _window(self):
+        """Physical (rows, cols) index arrays of the current window, in write order."""
+        key = (self.registers['CASET'], self.registers['RASET'], self.registers['MADCTL'])
+        if self._window_cache is not None and self._window_cache[0] == key:
+            return self._window_cache[1]
+        (xs, xe), (ys, ye), madctl = key
+        ys_grid, xs_grid = np.mgrid[ys:ye + 1, xs:xe + 1]
+        xs_grid, ys_grid = xs_grid.reshape(-1), ys_grid.reshape(-1)
+        if madctl & 0x20:
+            cols, rows = ys_grid, xs_grid
+        else:
+            cols, rows = xs_grid, ys_grid
+        if madctl & 0x40:
+            cols = self.gram_width - 1 - cols
+        if madctl & 0x80:
+            rows = self.gram_height - 1 - rows
+        valid = (cols >= 0) & (cols < self.gram_width) & (rows >= 0) & (rows < self.gram_height)
+        window = (np.where(valid, rows, -1), np.where(valid, cols, -1))
+        self._window_cache = (key, window)
+        return window
+
+    def _write_pixels(self, data, count):
+        pixels = self._decode(data, count)
+        rows, cols = self._window()
+        size = len(rows)
+        self.stats['pixels'] += count
+        start = 0
+        while start < count:
+            # writes past the end of the window wrap around to its start
+            chunk = min(count - start, size - self._pointer)
+            chunk_rows = rows[self._pointer:self._pointer + chunk]
+            chunk_cols = cols[self._pointer:self._pointer + chunk]
+            valid = chunk_rows >= 0
+            self.gram[chunk_rows[valid], chunk_cols[valid]] = pixels[start:start + chunk][valid]
+            start += chunk
+            self._pointer = (self._pointer + chunk) % size
+
+    def _read_pixels(self, size):
+        """Read RGB 6-6-6 pixel data from the window."""
+        rows, cols = self._window()
+        count = (size + 2) // 3
+        index = (np.arange(self._read_pointer, self._read_pointer + count)) % len(rows)
+        self._read_pointer = (self._read_pointer + count) % len(rows)
+        pixels = self.gram[np.maximum(rows[index], 0), np.maximum(cols[index], 0)] & 0xfc
+        return pixels.tobytes()[:size]
+
+    def displayed(self):
+        """RGB array of what the panel currently shows, following scrolling and inversion."""
+        if self.registers['SLEEP'] or not self.registers['DISPLAY']:
+            return np.zeros_like(self.gram)
+        tfa, vsa, _ = self.registers['VSCRDEF']
+        lines = np.arange(self.gram_height)
+        if vsa > 0:
+            scrolled = (lines >= tfa) & (lines < tfa + vsa)
+            offset = self.registers['VSCSAD'] - tfa
+            lines = np.where(scrolled, tfa + (lines - tfa + offset) % vsa, lines)
+        frame = self.gram[lines]
+        if self.registers['INV'] != self.inverted_panel:
+            frame = 255 - frame
+        return frame
+
+    def snapshot(self, raw=False):
+        """Get a PIL image of the display.
+
+        Args:
+            raw:    Whether to return the memory contents instead of what the
+                    panel shows (ignoring scrolling, inversion and sleep).
+        """
+        from PIL import Image  # pylint: disable=C0415
+        return Image.fromarray(self.gram.copy() if raw else self.displayed(), 'RGB')
@@ -1,10 +1,21 @@
 """Abstract IO and SPI wrapper."""
+import threading
+import time
+from .backlight import PinBacklight
+
+# Locks of shared SPI buses, by bus identifier
+_BUS_LOCKS = {}
+_BUS_LOCKS_GUARD = threading.Lock()
 
 
 class IOWrapper:
     """Abstract IO and SPI wrapper."""
+    # Maximum size of a single SPI transfer, None if there is no limit
+    spi_limit = None
+    # Identifier of the SPI bus, interfaces with the same identifier share their `bus_lock`
+    bus = None
 
-    def __init__(self, pin_cs=8, pin_dc=25, pin_rst=27, pin_bl=18):
+    def __init__(self, pin_cs=8, pin_dc=25, pin_rst=27, pin_bl=18, pin_te=None):
         """You should not instantiate this directly.
 
         Args:
@@ -12,12 +23,17 @@ class IOWrapper:
             pin_dc:     Data Carry pin
             pin_rst:    Reset pin
             pin_bl:     Backlight pin
+            pin_te:     Tearing Effect pin (input), None if not connected
         """
         self.cs = pin_cs
         self.dc = pin_dc
         self.rst = pin_rst
         self.bl = pin_bl
+        self.te = pin_te
         self._open = False
+        self._close_callbacks = []
+        self._bus_lock = threading.RLock()
+        self._backlight = None
 
     def __enter__(self):
         """Wrapper for open() for use as a context."""
@@ -39,11 +55,85 @@ class IOWrapper:
         """Close the interface."""
         if not self._open:
             raise IOError("Interface is not opened")
+        for callback in list(self._close_callbacks):
+            callback()
+        if self._backlight is not None:
+            self._backlight.stop()
         self.set_low(self.bl)
         self.set_low(self.dc)
         self.set_high(self.rst)
         self._open = False
 
+    @property
+    def bus_lock(self):
+        """Reentrant lock serializing transfers on the SPI bus.
+
+        Interfaces with the same `bus` identifier share the same lock, so that
+        displays sharing a bus can be driven from different threads.
+        """
+        if self.bus is None:
+            return self._bus_lock
+        lock = _BUS_LOCKS.get(self.bus)
+        if lock is None:
+            with _BUS_LOCKS_GUARD:
+                lock = _BUS_LOCKS.setdefault(self.bus, threading.RLock())
+        return lock
+
+    @property
+    def backlight(self):
+        """Backlight controller, see `backlight.Backlight`.
+
+        Interfaces without a dedicated controller get one driving the `bl`
+        pin with `set_pin_pwm`.
+        """
+        if self._backlight is None:
+            self._backlight = PinBacklight(self)
+        return self._backlight
+
+    def add_close_callback(self, callback):
+        """Register a function to call when the interface is about to close."""
+        self._close_callbacks.append(callback)
+
+    def remove_close_callback(self, callback):
+        """Unregister a function registered with `add_close_callback`."""
+        if callback in self._close_callbacks:
+            self._close_callbacks.remove(callback)
+
+    def instrument(self, instrumentation):
+        """Report SPI writes, pin changes and command transfers.
+
+        The methods are wrapped on this instance only, so that there is no
+        cost when instrumentation is disabled.
+
+        Args:
+            instrumentation:    an `instrumentation.Instrumentation` object
+        """
+        self.uninstrument()
+        clock, record = time.perf_counter, instrumentation.record
+        spi_write, set_pin, send_command = self.spi_write, self.set_pin, self.send_command
+
+        def timed_spi_write(data):
+            start = clock()
+            spi_write(data)
+            record('spi', None, clock() - start, len(data))
+
+        def timed_set_pin(pin, state):
+            start = clock()
+            set_pin(pin, state)
+            record('pin', None, clock() - start, 0)
+
+        def timed_send_command(command, data=None, hold_cs=False):
+            start = clock()
+            send_command(command, data, hold_cs)
+            record('transfer', None, clock() - start, len(data) + 1 if data else 1)
+
+        self.spi_write, self.set_pin, self.send_command = timed_spi_write, timed_set_pin, timed_send_command
+
+    def uninstrument(self):
+        """Stop reporting events, see `instrument`."""
+        for name in ('spi_write', 'set_pin', 'send_command'):
+            self.__dict__.pop(name, None)
+
     def is_open(self):
         """Whether the interface is ready to use."""
         return self._open
@@ -56,6 +146,25 @@ class IOWrapper:
         """Set pin high."""
         self.set_pin(pin, True)
 
+    def send_command(self, command: bytes, data=None, hold_cs=False):
+        """Send a command byte followed by its data.
+
+        Args:
+            command:    the command byte, as a 1-byte bytes object
+            data:       bytes-like object to send after the command, if any
+            hold_cs:    whether CS is already held low by the caller, in which
+                        case it is left low
+        """
+        if not hold_cs:
+            self.set_low(self.cs)
+        self.set_low(self.dc)
+        self.spi_write(command)
+        if data:
+            self.set_high(self.dc)
+            self.spi_write(data)
+        if not hold_cs:
+            self.set_high(self.cs)
+
     def set_pin(self, pin: int, state: bool):
         """Write digital pin state."""
         raise NotImplementedError
@@ -64,6 +173,18 @@ class IOWrapper:
         """Write analog pin value (0-1)."""
         raise NotImplementedError
 
+    def wait_edge(self, pin: int, timeout: float = None):
+        """Wait for a rising edge on an input pin.
+
+        Args:
+            pin:        the pin to watch
+            timeout:    maximum time to wait in seconds, None to wait forever
+
+        Returns:
+            Whether an edge was detected before the timeout.
+        """
+        raise NotImplementedError
+
     def spi_write(self, data: bytes):
         """Write data to the SPI bus."""
         raise NotImplementedError
@@ -1,20 +1,99 @@
 """Raspberry Pi implementation of generic IOWrapper."""
 import RPi.GPIO as GPIO
 import spidev
+from .backlight import PWM_PINS, Backlight, SysfsPWM
 from .io_wrapper import IOWrapper
 
+SPIDEV_BUFSIZ = '/sys/module/spidev/parameters/bufsiz'
+
+
+def spidev_bufsiz(path=SPIDEV_BUFSIZ, default=4096):
+    """Maximum size of a single spidev transfer, as configured in the kernel module."""
+    try:
+        with open(path) as file:
+            return int(file.read().strip())
+    except (OSError, ValueError):
+        return default
+
+
+class SoftwarePWM(Backlight):
+    """Backlight driven by RPi.GPIO software PWM, on any output pin."""
+
+    def __init__(self, pin, frequency=100):
+        """Start the PWM signal at full brightness.
+
+        Args:
+            pin:        backlight pin, already set up as an output
+            frequency:  PWM frequency in Hz
+        """
+        super().__init__()
+        self._pin = pin
+        self._pwm = GPIO.PWM(pin, frequency)
+        self._pwm.start(100)
+
+    def _write(self, value):
+        self._pwm.ChangeDutyCycle(100 * value)
+
+    def close(self):
+        self.stop()
+        if self._pwm is not None:
+            self._pwm.stop()
+            self._pwm = None
+            GPIO.output(self._pin, 0)
+
 
 class RaspberryPi(IOWrapper):
     """RaspberryPi GPIO/SPI wrapper."""
     PWM_FREQ = 100
 
-    def __init__(self, spi_bus=0, gpio_mode=GPIO.BCM, **kwargs):
+    def __init__(self, spi_bus=0, spi_device=0, spi_speed_hz=90000000, gpio_mode=GPIO.BCM, spi_limit=None,
+                 backlight='auto', **kwargs):
+        """Define the GPIO and SPI configuration.
+
+        Args:
+            spi_bus:        SPI bus number
+            spi_device:     SPI device (chip select) number
+            spi_speed_hz:   SPI clock frequency
+            gpio_mode:      GPIO numbering mode
+            spi_limit:      Maximum size of a single SPI transfer, defaults to the
+                            spidev module `bufsiz` parameter.
+            backlight:      'sysfs' for hardware PWM through /sys/class/pwm,
+                            'gpio' for RPi.GPIO software PWM, 'auto' to use
+                            hardware PWM when the PWM channel of the backlight
+                            pin is already exported, or a `backlight.Backlight`
+                            to use (closed along with the interface).
+            **kwargs:       pin numbers, see `IOWrapper`
+        """
         super().__init__(**kwargs)
         self._spi_bus = spi_bus
+        self._spi_device = spi_device
+        self._spi_speed_hz = spi_speed_hz
         self._gpio_mode = gpio_mode
-        self._backlight = None
+        self._backlight_choice = backlight
         self._spi = None
-        self._spi_limit = 4096
+        self._spi_limit = spi_limit or spidev_bufsiz()
+        self._writebytes2 = None
+
+    @property
+    def bus(self):
+        """SPI bus identifier, interfaces on the same bus share their `bus_lock`."""
+        return ('spidev', self._spi_bus)
+
+    @property
+    def spi_limit(self):
+        """Maximum size of a single SPI transfer."""
+        return self._spi_limit
+
+    @property
+    def spi_speed_hz(self):
+        """SPI clock frequency."""
+        return self._spi_speed_hz
+
+    @spi_speed_hz.setter
+    def spi_speed_hz(self, value):
+        self._spi_speed_hz = int(value)
+        if self._spi is not None:
+            self._spi.max_speed_hz = self._spi_speed_hz
 
     def open(self):
         super().open()
@@ -22,32 +101,79 @@ class RaspberryPi(IOWrapper):
         GPIO.setup(self.cs, GPIO.OUT, initial=GPIO.HIGH)
         GPIO.setup(self.dc, GPIO.OUT, initial=GPIO.LOW)
         GPIO.setup(self.rst, GPIO.OUT, initial=GPIO.HIGH)
-        GPIO.setup(self.bl, GPIO.OUT)
-        self._backlight = GPIO.PWM(self.bl, RaspberryPi.PWM_FREQ)
-        self._backlight.start(100)
-        self._spi = spidev.SpiDev(self._spi_bus, 0)
+        if self.te is not None:
+            GPIO.setup(self.te, GPIO.IN)
+        self._backlight = self._open_backlight()
+        self._spi = spidev.SpiDev(self._spi_bus, self._spi_device)
         self._spi.mode = 0b00
-        self._spi.max_speed_hz = 90000000
+        self._spi.max_speed_hz = self._spi_speed_hz
+        # writebytes2 (spidev 3.5+) accepts buffers of any size without copying them to a list
+        self._writebytes2 = getattr(self._spi, 'writebytes2', None)
         return self
 
+    def _open_backlight(self):
+        """Create the backlight controller, hardware PWM leaves the pin to the PWM peripheral."""
+        choice = self._backlight_choice
+        if isinstance(choice, Backlight):
+            return choice
+        if choice not in ('auto', 'sysfs', 'gpio'):
+            raise ValueError("Unknown backlight type '%s'" % choice)
+        channel = PWM_PINS.get(self.bl) if self._gpio_mode == GPIO.BCM else None
+        if choice == 'sysfs':
+            if channel is None or not SysfsPWM.available(*channel):
+                raise IOError("No hardware PWM channel enabled for pin %d" % self.bl)
+            return SysfsPWM(*channel)
+        # pins 12 and 18 (or 13 and 19) share a channel, which may be routed to the
+        # other pin, so it is only used automatically once it has been exported
+        if choice == 'auto' and channel is not None and SysfsPWM.exported(*channel):
+            return SysfsPWM(*channel)
+        GPIO.setup(self.bl, GPIO.OUT)
+        return SoftwarePWM(self.bl, RaspberryPi.PWM_FREQ)
+
     def close(self):
         super().close()
         self._spi.close()
-        self._backlight.stop()
-        GPIO.output(self.bl, 0)
+        self._spi = None
+        self._writebytes2 = None
+        self._backlight.close()
+        self._backlight = None
         GPIO.cleanup()
 
+    def send_command(self, command: bytes, data=None, hold_cs=False):
+        output = GPIO.output
+        if not hold_cs:
+            output(self.cs, GPIO.LOW)
+        output(self.dc, GPIO.LOW)
+        self._spi.writebytes(command)
+        if data:
+            output(self.dc, GPIO.HIGH)
+            self.spi_write(data)
+        if not hold_cs:
+            output(self.cs, GPIO.HIGH)
+
     def set_pin(self, pin: int, state: bool):
+        if pin == self.bl:
+            self._backlight.set(state)
+            return
         GPIO.output(pin, state)
 
     def set_pin_pwm(self, pin: int, value: float):
         if pin != self.bl:
             raise NotImplementedError('Only backlight pin is set up as PWM')
-        self._backlight.ChangeDutyCycle(min(100, max(0, int(100*value))))
+        self._backlight.set(value)
+
+    def wait_edge(self, pin: int, timeout: float = None):
+        if timeout is None:
+            return GPIO.wait_for_edge(pin, GPIO.RISING) is not None
+        return GPIO.wait_for_edge(pin, GPIO.RISING, timeout=max(1, int(timeout * 1000))) is not None
 
     def spi_write(self, data: bytes):
-        for i in range(0, len(data), self._spi_limit):
-            self._spi.writebytes(data[i:i+self._spi_limit])
+        if self._writebytes2 is not None:
+            self._writebytes2(data)
+            return
+        view = memoryview(data)
+        for i in range(0, len(view), self._spi_limit):
+            self._spi.writebytes(view[i:i+self._spi_limit])
 
     def spi_read(self, size: int):
         return self._spi.readbytes(size)
@@ -0,0 +1,59 @@
+"""Deferred loading of optional dependencies."""
+import importlib
+import importlib.util
+import sys
+import threading
+
+
+class _LazyModule:
+    """Stand-in for a module, imported when one of its attributes is first used.
+
+    The module is imported normally, under a lock, so that threads using it
+    at the same time wait for it to be fully loaded, and it only appears in
+    `sys.modules` once loaded. Its attributes are then copied to the proxy, so
+    that using them costs no more than using the module.
+    """
+
+    def __init__(self, name):
+        self.__name = name
+        self.__module = None
+        self.__lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        return getattr(self.__load(), attr)
+
+    def __repr__(self):
+        return '<lazy module %r>' % self.__name
+
+    def __load(self):
+        with self.__lock:
+            if self.__module is None:
+                module = importlib.import_module(self.__name)
+                vars(self).update(vars(module))
+                self.__module = module
+        return self.__module
+
+
+def optional_import(name):
+    """Get a module which is only loaded when one of its attributes is first used.
+
+    This keeps importing this package fast when optional dependencies such as
+    NumPy are installed but not needed.
+
+    Args:
+        name:   absolute module name
+
+    Returns:
+        The module, a proxy loading it if it was not imported yet, or None if
+        it is not installed.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    try:
+        spec = importlib.util.find_spec(name)
+    except (ImportError, ValueError):
+        return None
+    if spec is None or spec.loader is None:
+        return None
+    return _LazyModule(name)
@@ -0,0 +1,192 @@
+"""Frame player converting frames ahead on worker threads."""
+import threading
+import time
+
+try:
+    from PIL import Image, ImageSequence
+except ImportError:
+    Image = ImageSequence = None
+
+
+def _is_image_file(source):
+    """Whether a frame source is a file name, file object or PIL image to play as an animation."""
+    return isinstance(source, (str, bytes)) or hasattr(source, '__fspath__') or hasattr(source, 'read') \
+        or hasattr(source, 'getdata')
+
+
+def iter_frames(source, loop=False):
+    """Iterate over the frames of a source.
+
+    Args:
+        source: PIL image (possibly animated), file name or file object of an
+                image or animation (GIF, APNG...), NumPy array of frames
+                (4D), or iterable of frames (PIL images, NumPy arrays)
+        loop:   Whether to repeat animations from files or PIL images forever
+
+    Yields:
+        (frame, duration) tuples, duration being the frame duration stored in
+        the animation in seconds, or None.
+    """
+    if _is_image_file(source):
+        if Image is None:
+            raise ImportError("Playing image files requires PIL")
+        image = source if hasattr(source, 'getdata') else Image.open(source)
+        while True:
+            for frame in ImageSequence.Iterator(image):
+                duration = frame.info.get('duration')
+                yield frame.convert('RGB'), duration / 1000 if duration else None
+            if not loop:
+                return
+    else:
+        for frame in source:
+            yield frame, None
+
+
+class Player:
+    """Play a sequence of frames on a display.
+
+    Worker threads read frames from the source and convert them to the
+    display's color mode, at most `ahead` frames before the one being shown,
+    so that memory stays bounded whatever the source length. Frames are shown
+    in order from the calling thread, paced to the target frame rate, and
+    frames which are already late when ready are dropped.
+    """
+
+    def __init__(self, display, source, fps=None, ahead=4, workers=1, drop=True, loop=False):
+        """Prepare the player.
+
+        Args:
+            display:    `Display` to draw to, frames must cover its whole screen
+            source:     frames to play, see `iter_frames`
+            fps:        target frame rate, defaults to the durations stored in
+                        animations, or as fast as possible
+            ahead:      maximum number of frames read but not shown yet
+            workers:    number of conversion threads
+            drop:       Whether to skip frames which are late
+            loop:       Whether to repeat animations from files or PIL images
+        """
+        if ahead < 1 or workers < 1:
+            raise ValueError("At least one worker and one frame ahead are needed")
+        self.display = display
+        self.fps = fps
+        self.ahead = ahead
+        self.workers = workers
+        self.drop = drop
+        self.shown = 0
+        self.dropped = 0
+        self.elapsed = 0.0
+        self._frames = iter_frames(source, loop)
+        self._source_lock = threading.Lock()
+        self._slots = threading.Semaphore(ahead)
+        self._cond = threading.Condition()
+        self._ready = {}
+        self._read = 0
+        self._end = None
+        self._error = None
+        self._stopped = False
+
+    @property
+    def achieved_fps(self):
+        """Frame rate of shown frames."""
+        return self.shown / self.elapsed if self.elapsed else 0.0
+
+    def stop(self):
+        """Stop playing, from another thread or from a callback."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def play(self, callback=None):
+        """Play all frames, returning when the source is exhausted or `stop` is called.
+
+        Args:
+            callback:   function called with the player after each frame shown
+
+        Returns:
+            The player, with `shown`, `dropped`, `elapsed` and `achieved_fps`.
+        """
+        threads = [threading.Thread(target=self._work, name='st7789v-player-%d' % i, daemon=True)
+                   for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            self._show(callback)
+        finally:
+            self.stop()
+            for _ in threads:
+                self._slots.release()
+            for thread in threads:
+                thread.join()
+        return self
+
+    def _show(self, callback):
+        """Show frames in order, in the calling thread."""
+        start = time.monotonic()
+        deadline = start
+        index = 0
+        while True:
+            with self._cond:
+                while index not in self._ready and self._error is None and not self._stopped \
+                        and (self._end is None or index < self._end):
+                    self._cond.wait()
+                if self._error is not None:
+                    raise self._error
+                if self._stopped or index not in self._ready:
+                    break
+                data, duration = self._ready.pop(index)
+                newer = index + 1 in self._ready
+            index += 1
+            interval = 1 / self.fps if self.fps else duration or 0.0
+            now = time.monotonic()
+            late = interval and now > deadline + interval
+            if self.drop and late and newer:
+                # this frame's slot is over and the next one is ready, catch up with it
+                self.dropped += 1
+            else:
+                if late:
+                    # nothing newer to show, play at the rate frames are ready
+                    deadline = now
+                elif now < deadline:
+                    time.sleep(deadline - now)
+                self.display.draw_native(data)
+                self.shown += 1
+                if callback is not None:
+                    callback(self)
+            deadline += interval
+            # count the slot of the last frame, which is over once the next one is due
+            self.elapsed = max(time.monotonic(), deadline) - start
+            self._slots.release()
+
+    def _work(self):
+        """Read and convert frames, in a worker thread."""
+        while True:
+            self._slots.acquire()
+            with self._source_lock:
+                if self._stopped or self._end is not None:
+                    return
+                try:
+                    frame, duration = next(self._frames)
+                except StopIteration:
+                    with self._cond:
+                        self._end = self._read
+                        self._cond.notify_all()
+                    return
+                except Exception as error:  # pylint: disable=W0703
+                    self._fail(error)
+                    return
+                index = self._read
+                self._read += 1
+            try:
+                data = self.display.to_native(frame)
+            except Exception as error:  # pylint: disable=W0703
+                self._fail(error)
+                return
+            with self._cond:
+                self._ready[index] = (data, duration)
+                self._cond.notify_all()
+
+    def _fail(self, error):
+        """Report an error from a worker thread to the playing thread."""
+        with self._cond:
+            self._error = error
+            self._cond.notify_all()
@@ -0,0 +1,49 @@
+"""Images cached in the native format of the display."""
+
+
+def source_size(source):
+    """Get the (width, height) of a PIL image, NumPy array or `Sprite`."""
+    if hasattr(source, 'shape'):
+        return source.shape[1], source.shape[0]
+    return source.width, source.height
+
+
+def crop(source, left, top, right, bottom):
+    """Get a region of a PIL image or NumPy array."""
+    if hasattr(source, 'shape'):
+        return source[top:bottom, left:right]
+    return source.crop((left, top, right, bottom))
+
+
+class Sprite:
+    """Image drawn with `Display.blit`, caching its converted bytes.
+
+    The bytes are converted once per color mode, so drawing a sprite only
+    sends them. Call `invalidate` after modifying the source image.
+    """
+
+    def __init__(self, source):
+        """Create the sprite.
+
+        Args:
+            source: PIL image or NumPy array of shape (height, width, 3)
+        """
+        self.source = source
+        self.width, self.height = source_size(source)
+        self._native = {}
+
+    def invalidate(self):
+        """Forget the converted bytes, after the source has been modified."""
+        self._native.clear()
+
+    def native(self, display):
+        """Get the sprite's bytes in the current color mode of a display.
+
+        Args:
+            display:    `Display` whose color mode and dithering setting are used
+        """
+        key = (display.color_mode['id'], display.dither)
+        data = self._native.get(key)
+        if data is None:
+            data = self._native[key] = display.to_native(self.source)
+        return data
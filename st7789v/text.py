@@ -0,0 +1,98 @@
+"""Text drawn from glyphs rasterized once in the native format of the display."""
+import collections
+
+# Maximum number of atlases kept by `atlas`
+ATLAS_CACHE_SIZE = 8
+_ATLASES = collections.OrderedDict()
+_DEFAULT_FONT = []
+
+
+class GlyphAtlas:
+    """Glyphs of a font, size and colors, converted to a color mode.
+
+    Each glyph is rasterized once, as rows of native bytes, so that a string
+    is rendered by joining the rows of its glyphs. Glyphs are laid out on
+    their advance width, without kerning, and RGB 4-4-4 glyphs are padded to
+    an even width since pixels are packed in pairs.
+    """
+
+    def __init__(self, font, fill, background, color_mode):
+        """Prepare the atlas, glyphs are rasterized when first used.
+
+        Args:
+            font:       PIL font (`ImageFont`), e.g. from `ImageFont.truetype`
+            fill:       text color, as an (R, G, B) tuple
+            background: background color, as an (R, G, B) tuple
+            color_mode: color mode description, from `colors.MODES`
+        """
+        self.font = font
+        self.fill = fill
+        self.background = background
+        self.color_mode = color_mode
+        if hasattr(font, 'getmetrics'):
+            ascent, descent = font.getmetrics()
+            self.height = ascent + descent
+        else:
+            self.height = font.getbbox('Ag')[3]
+        self._glyphs = {}
+
+    def glyph(self, char):
+        """Get the (width, rows) of a glyph, rows being a list of bytes objects."""
+        glyph = self._glyphs.get(char)
+        if glyph is None:
+            glyph = self._glyphs[char] = self._rasterize(char)
+        return glyph
+
+    def _rasterize(self, char):
+        """Render a glyph and convert it to the color mode."""
+        from PIL import Image, ImageDraw  # pylint: disable=C0415
+        width = max(1, int(round(self.font.getlength(char))))
+        width += width % 2 * (self.color_mode['bytes2'] % 2)
+        image = Image.new('RGB', (width, self.height), self.background)
+        ImageDraw.Draw(image).text((0, 0), char, font=self.font, fill=self.fill)
+        data = bytes(self.color_mode['image'](image))
+        row = width * self.color_mode['bytes2'] // 2
+        return width, [data[y * row:(y + 1) * row] for y in range(self.height)]
+
+    def render(self, text):
+        """Render a single line of text.
+
+        Returns:
+            The (width, data) of the text, data being in the atlas' color mode.
+        """
+        glyphs = [self.glyph(char) for char in text]
+        width = sum(glyph[0] for glyph in glyphs)
+        return width, b''.join(rows[y] for y in range(self.height) for _, rows in glyphs)
+
+
+def _color(color):
+    """Convert a PIL color specification to an (R, G, B) tuple."""
+    if isinstance(color, str):
+        from PIL import ImageColor  # pylint: disable=C0415
+        return ImageColor.getrgb(color)[:3]
+    return tuple(color[:3])
+
+
+def atlas(font, fill, background, color_mode):
+    """Get a `GlyphAtlas`, reusing the most recently used ones.
+
+    Args:
+        font:       PIL font, None for PIL's default font
+        fill:       text color, as an (R, G, B) tuple or PIL color name
+        background: background color, as an (R, G, B) tuple or PIL color name
+        color_mode: color mode description, from `colors.MODES`
+    """
+    if font is None:
+        if not _DEFAULT_FONT:
+            from PIL import ImageFont  # pylint: disable=C0415
+            _DEFAULT_FONT.append(ImageFont.load_default())
+        font = _DEFAULT_FONT[0]
+    key = (font, _color(fill), _color(background), color_mode['id'])
+    glyphs = _ATLASES.get(key)
+    if glyphs is None:
+        glyphs = _ATLASES[key] = GlyphAtlas(font, key[1], key[2], color_mode)
+        while len(_ATLASES) > ATLAS_CACHE_SIZE:
+            _ATLASES.popitem(last=False)
+    else:
+        _ATLASES.move_to_end(key)
+    return glyphs
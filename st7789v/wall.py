@@ -0,0 +1,135 @@
+"""Several displays driven as a single canvas."""
+import concurrent.futures
+
+
+class VideoWall:
+    """Show frames across several displays placed side by side.
+
+    Each display shows the part of the canvas covered by its whole screen,
+    in its own rotation and color mode. Displays on different SPI buses are
+    drawn to in parallel, while displays sharing a bus are drawn to in turn,
+    so that a frame takes about as long as the busiest bus.
+
+    `to_native` and `draw_native` work as for a single display, so a wall can
+    be used with `player.Player`.
+    """
+
+    def __init__(self, panels):
+        """Define the position of each display on the canvas.
+
+        Args:
+            panels: list of (display, left, top) tuples, displays being
+                    initialized `Display` objects
+        """
+        if not panels:
+            raise ValueError("A video wall needs at least one display")
+        self.panels = [(display, left, top) for display, left, top in panels]
+        # size of the screen of each display, the bounds change with partial drawing
+        self._sizes = [(display.max_w, display.max_h) for display, _, _ in self.panels]
+        self.width = max(left + width for (_, left, _), (width, _) in zip(self.panels, self._sizes))
+        self.height = max(top + height for (_, _, top), (_, height) in zip(self.panels, self._sizes))
+        # panels grouped by bus, each group is drawn to by a single thread
+        groups = []
+        for index, (display, _, _) in enumerate(self.panels):
+            for group in groups:
+                if self.panels[group[0]][0]._io.bus_lock is display._io.bus_lock:  # pylint: disable=W0212
+                    group.append(index)
+                    break
+            else:
+                groups.append([index])
+        self._groups = groups
+        self._executor = None
+        if len(groups) > 1:
+            self._executor = concurrent.futures.ThreadPoolExecutor(len(groups) - 1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_trace):
+        self.close()
+
+    def close(self):
+        """Stop the threads used to draw in parallel."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    @staticmethod
+    def crop(frame, left, top, right, bottom):
+        """Get a region of a frame.
+
+        Args:
+            frame:  PIL image or NumPy array of shape (height, width, 3)
+            left:   left bound (included)
+            top:    top bound (included)
+            right:  right bound (excluded)
+            bottom: bottom bound (excluded)
+        """
+        if hasattr(frame, 'crop'):
+            return frame.crop((left, top, right, bottom))
+        return frame[top:bottom, left:right]
+
+    def _parallel(self, func):
+        """Call `func` with the indices of each group of panels, one thread per group."""
+        futures = [self._executor.submit(func, group) for group in self._groups[1:]] if self._executor else []
+        try:
+            first = func(self._groups[0])
+        finally:
+            results = [future.result() for future in futures]
+        return [first] + results
+
+    def to_native(self, frame):
+        """Convert a canvas frame to the bytes of each display.
+
+        Args:
+            frame:  PIL image or NumPy array of shape (height, width, 3)
+                    covering the canvas
+
+        Returns:
+            A list of converted frames, one per display.
+        """
+        return [display.to_native(self.crop(frame, left, top, left + width, top + height))
+                for (display, left, top), (width, height) in zip(self.panels, self._sizes)]
+
+    def draw_native(self, data):
+        """Draw frames converted with `to_native` to each display.
+
+        Returns:
+            The number of bytes saved by frame differencing, for all displays.
+        """
+        def draw(group):
+            saved = 0
+            for index in group:
+                display = self.panels[index][0]
+                with display._io.bus_lock:  # pylint: disable=W0212
+                    saved += display.draw_native(data[index])
+            return saved
+        return sum(self._parallel(draw))
+
+    def draw_frame(self, frame):
+        """Draw a canvas frame across all displays.
+
+        Each display converts its part in the thread drawing to its bus.
+
+        Args:
+            frame:  PIL image or NumPy array of shape (height, width, 3)
+                    covering the canvas
+
+        Returns:
+            The number of bytes saved by frame differencing, for all displays.
+        """
+        def draw(group):
+            saved = 0
+            for index in group:
+                display, left, top = self.panels[index]
+                width, height = self._sizes[index]
+                region = self.crop(frame, left, top, left + width, top + height)
+                with display._io.bus_lock:  # pylint: disable=W0212
+                    saved += display.draw_frame(region)
+            return saved
+        return sum(self._parallel(draw))
+
+    def play(self, frames, fps=None, ahead=4, workers=1, drop=True, loop=False, callback=None):
+        """Play a sequence of canvas frames, see `Display.play`."""
+        from .player import Player  # pylint: disable=C0415
+        return Player(self, frames, fps, ahead, workers, drop, loop).play(callback)
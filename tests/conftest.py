@@ -0,0 +1,92 @@
+"""Fixtures shared by the tests."""
+import importlib
+import sys
+import types
+
+import pytest
+
+
+class FakePWM:
+    """Stand-in for `RPi.GPIO.PWM`, recording the duty cycle."""
+
+    def __init__(self, pin, frequency):
+        self.pin = pin
+        self.frequency = frequency
+        self.duty_cycle = None
+        self.running = False
+
+    def start(self, duty_cycle):
+        self.duty_cycle = duty_cycle
+        self.running = True
+
+    def ChangeDutyCycle(self, duty_cycle):  # pylint: disable=C0103
+        self.duty_cycle = duty_cycle
+
+    def stop(self):
+        self.running = False
+
+
+class FakeSpiDev:
+    """Stand-in for `spidev.SpiDev`, recording the transfers."""
+    # set to False to simulate spidev versions without writebytes2
+    has_writebytes2 = True
+
+    def __init__(self, bus, device):
+        self.bus = bus
+        self.device = device
+        self.mode = None
+        self.max_speed_hz = None
+        self.writes = []
+        self.closed = False
+        if not self.has_writebytes2:
+            self.writebytes2 = None
+
+    def writebytes(self, data):
+        self.writes.append(('writebytes', bytes(data)))
+
+    def writebytes2(self, data):  # pylint: disable=E0202
+        self.writes.append(('writebytes2', bytes(data)))
+
+    def readbytes(self, size):
+        return [0] * size
+
+    def close(self):
+        self.closed = True
+
+
+def _fake_gpio():
+    gpio = types.ModuleType('RPi.GPIO')
+    gpio.BCM, gpio.BOARD = 11, 10
+    gpio.OUT, gpio.IN = 0, 1
+    gpio.HIGH, gpio.LOW = 1, 0
+    gpio.RISING = 31
+    gpio.pins = {}
+    gpio.pwms = []
+    gpio.setmode = lambda mode: None
+    gpio.setup = lambda pin, direction, initial=None: gpio.pins.__setitem__(pin, initial)
+    gpio.output = lambda pin, state: gpio.pins.__setitem__(pin, state)
+    gpio.cleanup = lambda *args: None
+    gpio.wait_for_edge = lambda pin, edge, timeout=None: pin
+
+    def pwm(pin, frequency):
+        gpio.pwms.append(FakePWM(pin, frequency))
+        return gpio.pwms[-1]
+    gpio.PWM = pwm
+    return gpio
+
+
+@pytest.fixture
+def raspberry(monkeypatch):
+    """The `interface.raspberry` module, imported with fake RPi.GPIO and spidev modules."""
+    gpio = _fake_gpio()
+    rpi = types.ModuleType('RPi')
+    rpi.GPIO = gpio
+    spidev = types.ModuleType('spidev')
+    spidev.SpiDev = type('SpiDev', (FakeSpiDev,), {})
+    monkeypatch.setitem(sys.modules, 'RPi', rpi)
+    monkeypatch.setitem(sys.modules, 'RPi.GPIO', gpio)
+    monkeypatch.setitem(sys.modules, 'spidev', spidev)
+    monkeypatch.delitem(sys.modules, 'st7789v.interface.raspberry', raising=False)
+    module = importlib.import_module('st7789v.interface.raspberry')
+    yield module
+    sys.modules.pop('st7789v.interface.raspberry', None)
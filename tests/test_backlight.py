@@ -0,0 +1,114 @@
+"""Tests of the backlight controllers, against a fake sysfs PWM tree."""
+import os
+import threading
+import time
+
+import pytest
+
+from st7789v.interface.backlight import SysfsPWM
+
+
+def read(path):
+    """Read a sysfs value, ignoring what is left over from longer previous values."""
+    with open(path) as file:
+        return file.read().split('\n')[0]
+
+
+@pytest.fixture
+def pwm_root(tmp_path):
+    """A pwmchip0 with 2 channels, whose `export` creates channels as the kernel does."""
+    chip = tmp_path / 'pwmchip0'
+    chip.mkdir()
+    (chip / 'npwm').write_text('2\n')
+    (chip / 'unexport').write_text('')
+    os.mkfifo(str(chip / 'export'))
+
+    def kernel():
+        with open(str(chip / 'export')) as file:
+            channel = chip / ('pwm%d' % int(file.read()))
+        channel.mkdir()
+        for name in ('period', 'duty_cycle', 'enable'):
+            (channel / name).write_text('0\n')
+
+    thread = threading.Thread(target=kernel, daemon=True)
+    thread.start()
+    yield str(tmp_path)
+    if thread.is_alive():
+        # release the thread waiting for an export which did not happen
+        with open(str(chip / 'export'), 'w') as file:
+            file.write('9')
+    thread.join()
+
+
+def test_export_and_setup(pwm_root):
+    channel = os.path.join(pwm_root, 'pwmchip0', 'pwm0')
+    assert SysfsPWM.available(0, 0, pwm_root)
+    assert not SysfsPWM.available(0, 2, pwm_root)
+    assert not SysfsPWM.exported(0, 0, pwm_root)
+    backlight = SysfsPWM(0, 0, frequency=1000, root=pwm_root, timeout=5)
+    assert SysfsPWM.exported(0, 0, pwm_root)
+    assert read(os.path.join(channel, 'period')) == '1000000'
+    assert read(os.path.join(channel, 'duty_cycle')) == '1000000'
+    assert read(os.path.join(channel, 'enable')) == '1'
+    backlight.set(0.25)
+    assert read(os.path.join(channel, 'duty_cycle')) == '250000'
+    assert backlight.value == 0.25
+    backlight.set(2)
+    assert read(os.path.join(channel, 'duty_cycle')) == '1000000'
+    backlight.close()
+
+
+def test_close_unexports(pwm_root):
+    chip = os.path.join(pwm_root, 'pwmchip0')
+    backlight = SysfsPWM(0, 0, root=pwm_root, timeout=5)
+    backlight.close()
+    assert read(os.path.join(chip, 'pwm0', 'enable')) == '0'
+    assert read(os.path.join(chip, 'unexport')) == '0'
+
+
+def test_close_keeps_channels_exported_elsewhere(pwm_root):
+    chip = os.path.join(pwm_root, 'pwmchip0')
+    channel = os.path.join(chip, 'pwm1')
+    os.mkdir(channel)
+    for name in ('period', 'duty_cycle', 'enable'):
+        with open(os.path.join(channel, name), 'w') as file:
+            file.write('0\n')
+    backlight = SysfsPWM(0, 1, root=pwm_root)
+    backlight.close()
+    assert read(os.path.join(channel, 'enable')) == '0'
+    assert read(os.path.join(chip, 'unexport')) == ''
+
+
+def test_fade(pwm_root):
+    duty_cycle = os.path.join(pwm_root, 'pwmchip0', 'pwm0', 'duty_cycle')
+    backlight = SysfsPWM(0, 0, frequency=1000, root=pwm_root, timeout=5)
+    start = time.monotonic()
+    backlight.fade(0, 0.1, wait=True)
+    assert time.monotonic() - start >= 0.1
+    assert backlight.value == 0
+    assert read(duty_cycle) == '0'
+    backlight.close()
+
+
+def test_fade_cancelled_by_set(pwm_root):
+    duty_cycle = os.path.join(pwm_root, 'pwmchip0', 'pwm0', 'duty_cycle')
+    backlight = SysfsPWM(0, 0, frequency=1000, root=pwm_root, timeout=5)
+    backlight.fade(0, 1.0)
+    time.sleep(0.1)
+    assert 0 < backlight.value < 1
+    backlight.set(0.5)
+    assert backlight.wait(1)
+    time.sleep(0.05)
+    assert backlight.value == 0.5
+    assert read(duty_cycle) == '500000'
+    backlight.close()
+
+
+def test_raspberry_auto_needs_exported_channel(raspberry, monkeypatch):
+    monkeypatch.setattr(raspberry.SysfsPWM, 'available', staticmethod(lambda chip, channel: True))
+    monkeypatch.setattr(raspberry.SysfsPWM, 'exported', staticmethod(lambda chip, channel: False))
+    rpi = raspberry.RaspberryPi(pin_bl=18, spi_limit=4096)
+    with rpi:
+        assert isinstance(rpi.backlight, raspberry.SoftwarePWM)
+        rpi.set_pin_pwm(rpi.bl, 0.5)
+        assert raspberry.GPIO.pwms[-1].duty_cycle == 50
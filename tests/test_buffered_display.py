@@ -0,0 +1,36 @@
+"""Tests of the buffered display, against the emulator."""
+import numpy as np
+import pytest
+from PIL import Image
+
+from st7789v import BufferedDisplay
+from st7789v import framebuffer
+from st7789v.interface import Emulator
+
+
+@pytest.fixture
+def emulator():
+    io = Emulator()
+    io.open()
+    yield io
+    io.close()
+
+
+def unshared_image(buffer):
+    """Stand-in for `FrameBuffer._shared_image` where PIL cannot map the array."""
+    buffer.shared = False
+    return Image.new('RGBX', (buffer.width, buffer.height))
+
+
+@pytest.mark.parametrize('damaged_only', [False, True])
+def test_async_update_with_unshared_framebuffer(emulator, monkeypatch, damaged_only):
+    monkeypatch.setattr(framebuffer.FrameBuffer, '_shared_image', unshared_image)
+    display = BufferedDisplay(emulator, numpy_buffer=True, color_mode=666)
+    assert not display.framebuffer.shared
+    display.start_async(buffers=2)
+    display.draw.rectangle((10, 20, 29, 39), fill=(255, 0, 0))
+    display.update(damaged_only=damaged_only)
+    display.flush()
+    assert np.array_equal(emulator.gram[20:40, 10:30], np.full((20, 20, 3), (255, 0, 0)))
+    assert not emulator.gram[:20].any()
+    display.stop_async()
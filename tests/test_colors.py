@@ -0,0 +1,70 @@
+"""Tests of the color conversions."""
+import tracemalloc
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from st7789v import colors, framebuffer
+
+
+def dithered(array, bits, left, top):
+    """Reference ordered dithering of an (H, W, 3) array, each channel to `bits[channel]` bits."""
+    height, width = array.shape[:2]
+    rows = (np.arange(height) + top) % colors.DITHER_SIZE
+    columns = (np.arange(width) + left) % colors.DITHER_SIZE
+    matrix = colors.bayer_matrix()[rows[:, None], columns[None, :]]
+    result = np.empty_like(array)
+    for channel, channel_bits in enumerate(bits):
+        value = array[..., channel].astype(np.int64)
+        result[..., channel] = value - (value >> channel_bits) + matrix * (256 >> channel_bits) // 16
+    return result
+
+
+@pytest.mark.parametrize('shape', [(8, 8), (3, 5), (1, 1), (7, 4)])
+@pytest.mark.parametrize('left, top', [(0, 0), (3, 2)])
+def test_dither_matches_reference(shape, left, top):
+    array = np.random.RandomState(0).randint(0, 256, shape + (3,)).astype(np.uint8)
+    count = shape[0] * shape[1]
+    expected = colors.array_to_rgb_444_np(dithered(array, (4, 4, 4), left, top).reshape(-1, 3))
+    assert bytes(colors.array_to_rgb_444_dither_np(array, None, None, left, top)) == bytes(expected)
+    scratch = np.empty(count * 3 // 2 + 1, dtype=np.uint8)
+    out = bytearray(b'\xff' * (count * 3 + 1))
+    assert bytes(colors.array_to_rgb_444_dither_np(array, out, scratch, left, top)) == bytes(expected)
+    expected = colors.array_to_rgb_565_np(dithered(array, (5, 6, 5), left, top))
+    assert bytes(colors.array_to_rgb_565_dither_np(array, None, None, left, top)) == bytes(expected)
+
+
+def test_dither_keeps_the_average():
+    ramp = np.repeat(np.arange(256, dtype=np.uint8), 16).reshape(-1, 4, 4)
+    array = np.repeat(ramp[..., None], 3, axis=-1).reshape(-1, 4, 3)
+    data = np.frombuffer(bytes(colors.array_to_rgb_444_dither_np(array)), dtype=np.uint8)
+    levels = np.stack((data >> 4, data & 0x0f), axis=-1).reshape(256, 16, 3)
+    shown = levels.mean(axis=1) * 17
+    assert abs(shown - np.arange(256)[:, None]).max() < 1
+
+
+@pytest.mark.parametrize('converter, size', [(colors.array_to_rgb_444_dither_np, 1.5),
+                                             (colors.array_to_rgb_565_dither_np, 2)])
+def test_dither_does_not_allocate_with_buffers(converter, size):
+    array = np.random.RandomState(0).randint(0, 256, (240, 320, 3)).astype(np.uint8)
+    out = bytearray(240 * 320 * 2)
+    scratch = np.empty(int(240 * 320 * size) + 1, dtype=np.uint8)
+    converter(array, out, scratch)
+    tracemalloc.start()
+    try:
+        converter(array, out, scratch, 1, 2)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < 16384
+
+
+@pytest.mark.parametrize('color_mode', [444, 565, 666])
+def test_framebuffer_matches_image_converters(color_mode):
+    buffer = framebuffer.FrameBuffer(7, 5)
+    buffer.rgb[...] = np.random.RandomState(0).randint(0, 256, (5, 7, 3))
+    image = Image.fromarray(np.ascontiguousarray(buffer.rgb), 'RGB')
+    mode = colors.MODES[color_mode]
+    assert bytes(buffer.convert(mode)) == bytes(mode['image'](image))
+    assert bytes(buffer.convert(mode, 1, 1, 4, 4)) == bytes(mode['image'](image.crop((1, 1, 4, 4))))
@@ -0,0 +1,62 @@
+"""Tests of the shared framebuffer daemon, against the emulator."""
+import logging
+import time
+
+import numpy as np
+import pytest
+
+from st7789v import Display
+from st7789v.daemon import FramebufferClient, FramebufferDaemon
+from st7789v.interface import Emulator
+
+
+@pytest.fixture
+def display():
+    io = Emulator()
+    io.open()
+    screen = Display(io)
+    screen.initialize(color_mode=444, rotation=0)
+    yield screen
+    io.close()
+
+
+@pytest.mark.parametrize('numpy_region', [True, False])
+def test_update_odd_region_444(display, tmp_path, numpy_region):
+    path = str(tmp_path / 'fb')
+    block = np.random.RandomState(0).randint(0, 256, (3, 5, 3)).astype(np.uint8)
+    with FramebufferDaemon(display, path, fps=None) as daemon:
+        daemon.update()
+        if not numpy_region:
+            daemon._array = None  # pylint: disable=W0212
+        with FramebufferClient(path) as client:
+            assert client.write(11, 20, block) == (11, 20, 16, 23)
+            daemon._receive(1)  # pylint: disable=W0212
+        daemon.update()
+    assert np.array_equal(display._io.gram[20:23, 11:16] & 0xf0, block & 0xf0)  # pylint: disable=W0212
+
+
+def test_serve_logs_update_errors(display, tmp_path, monkeypatch, caplog):
+    path = str(tmp_path / 'fb')
+    blit = display.blit
+    failures = []
+
+    def failing_blit(*args):
+        if not failures:
+            failures.append(1)
+            # the logged traceback keeps its frames, which must not hold the framebuffer to close it
+            del args
+            raise IOError("bus error")
+        return blit(*args)
+    monkeypatch.setattr(display, 'blit', failing_blit)
+    with caplog.at_level(logging.ERROR), FramebufferDaemon(display, path, fps=None) as daemon:
+        daemon.start()
+        with FramebufferClient(path) as client:
+            # the first update fails, the second one must still be served
+            for expected in (0, 1):
+                client.write(0, 0, np.full((2, 2, 3), 255, dtype=np.uint8))
+                deadline = time.monotonic() + 5
+                while len(failures) + daemon.updates <= expected and time.monotonic() < deadline:
+                    time.sleep(0.01)
+        daemon.stop()
+    assert failures and daemon.updates == 1
+    assert "Failed to update the display" in caplog.text
@@ -0,0 +1,77 @@
+"""Tests of the damage tracking."""
+import random
+
+from st7789v import damage
+
+
+def brute_force_merge(model, rects):
+    """Merge the pair with the greatest gain, evaluating every pair after each merge."""
+    rects = list(rects)
+    while len(rects) > 1:
+        best = None
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                gain = model.gain(rects[i], rects[j])
+                if best is None or gain > best[0]:
+                    best = (gain, i, j)
+        gain, i, j = best
+        if gain < 0:
+            break
+        rects[i] = damage.rect_union(rects[i], rects[j])
+        del rects[j]
+    return rects
+
+
+def random_rects(rng, count):
+    rects = []
+    for _ in range(count):
+        x, y = rng.randrange(240), rng.randrange(320)
+        rects.append((x, y, min(240, x + rng.randint(1, 60)), min(320, y + rng.randint(1, 60))))
+    return rects
+
+
+def test_merge_cost_matches_brute_force():
+    rng = random.Random(0)
+    model = damage.CostModel(2)
+    for _ in range(100):
+        rects = random_rects(rng, rng.randint(0, 20))
+        merged = model.merge(rects)
+        assert model.total_cost(merged) <= model.total_cost(brute_force_merge(model, rects))
+        for rect in rects:
+            assert any(other[0] <= rect[0] and other[1] <= rect[1] and rect[2] <= other[2] and rect[3] <= other[3]
+                       for other in merged)
+
+
+def test_merge_overlapping_and_distant():
+    model = damage.CostModel(2)
+    assert model.merge([(0, 0, 10, 10), (5, 5, 15, 15)]) == [(0, 0, 15, 15)]
+    assert model.merge([(0, 0, 10, 10), (200, 300, 210, 310)]) == [(0, 0, 10, 10), (200, 300, 210, 310)]
+
+
+def test_transaction_cost():
+    assert damage.transaction_overhead(90000000, 2e-6) == 270
+    assert damage.TRANSACTION_COST == damage.COMMAND_BYTES + damage.TRANSACTION_OVERHEAD
+    assert damage.transaction_overhead(45000000) == damage.TRANSACTION_OVERHEAD // 2
+
+
+def test_tracker_caps_rects():
+    tracker = damage.DamageTracker(240, 320, bytes_per_pixel=1.5)
+    rects = random_rects(random.Random(1), 200)
+    for rect in rects:
+        tracker.add(rect)
+    assert len(tracker.rects) == damage.MAX_RECTS
+    for rect in rects:
+        assert any(other[0] <= rect[0] and other[1] <= rect[1] and rect[2] <= other[2] and rect[3] <= other[3]
+                   for other in tracker.rects)
+    tracker.plan(3)
+    assert tracker.bytes_per_pixel == 3
+
+
+def test_tracker_merges_new_rect_into_cheapest():
+    tracker = damage.DamageTracker(240, 320)
+    for i in range(damage.MAX_RECTS):
+        tracker.add((0, i * 10, 5, i * 10 + 5))
+    tracker.add((6, 0, 10, 5))
+    assert len(tracker.rects) == damage.MAX_RECTS
+    assert tracker.rects[0] == (0, 0, 10, 5)
+    assert tracker.rects[1:] == [(0, i * 10, 5, i * 10 + 5) for i in range(1, damage.MAX_RECTS)]
@@ -0,0 +1,56 @@
+"""Tests of the display driver, against the emulator."""
+import numpy as np
+import pytest
+
+from st7789v import Display
+from st7789v.interface import Emulator
+
+
+@pytest.fixture
+def emulator():
+    io = Emulator()
+    io.open()
+    yield io
+    io.close()
+
+
+def display(io, color_mode):
+    screen = Display(io)
+    screen.initialize(color_mode=color_mode, rotation=0)
+    return screen
+
+
+@pytest.mark.parametrize('color_mode', [444, 565, 666])
+@pytest.mark.parametrize('rows, columns', [(slice(2, 5), slice(None)), (slice(1, 6, 2), slice(0, 3))])
+def test_blit_odd_array_view(emulator, color_mode, rows, columns):
+    screen = display(emulator, color_mode)
+    rng = np.random.RandomState(0)
+    source = rng.randint(0, 256, (10, 3, 3)).astype(np.uint8)
+    view = source[rows, columns]
+    height, width = view.shape[:2]
+    assert view.base is source and height * width % 2
+    before = source.copy()
+    assert screen.blit(5, 7, view) == (5, 7, 5 + width, 7 + height)
+    assert np.array_equal(source, before)
+    mask = {444: 0xf0, 565: 0xf8, 666: 0xfc}[color_mode]
+    gram = emulator.gram[7:7 + height, 5:5 + width]
+    assert np.array_equal(gram[..., 0] & mask, view[..., 0] & mask)
+    assert np.array_equal(gram[..., 2] & mask, view[..., 2] & mask)
+
+
+def test_failed_register_write_is_sent_again(emulator, monkeypatch):
+    screen = display(emulator, 565)
+    send_command = emulator.send_command
+    sent = []
+
+    def failing_send_command(command, data=None, hold_cs=False):
+        sent.append(command)
+        if len(sent) == 1:
+            raise IOError("bus error")
+        send_command(command, data, hold_cs)
+    monkeypatch.setattr(emulator, 'send_command', failing_send_command)
+    with pytest.raises(IOError):
+        screen.command('MADCTL', 0x60)
+    screen.command('MADCTL', 0x60)
+    screen.command('MADCTL', 0x60)
+    assert len(sent) == 2
@@ -0,0 +1,47 @@
+"""Tests of the deferred loading of optional dependencies."""
+import sys
+import threading
+
+import pytest
+
+from st7789v import lazy
+
+
+@pytest.fixture
+def slow_module(tmp_path, monkeypatch):
+    """Name of a module which takes a while to import, counting its imports."""
+    (tmp_path / 'st7789v_slow_module.py').write_text(
+        'import time\n'
+        'import st7789v_slow_counter\n'
+        'st7789v_slow_counter.imports += 1\n'
+        'time.sleep(0.2)\n'
+        'value = 42\n')
+    (tmp_path / 'st7789v_slow_counter.py').write_text('imports = 0\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield 'st7789v_slow_module'
+    sys.modules.pop('st7789v_slow_module', None)
+    sys.modules.pop('st7789v_slow_counter', None)
+
+
+def test_missing_module():
+    assert lazy.optional_import('st7789v_missing_module') is None
+
+
+def test_loaded_on_first_use(slow_module):
+    module = lazy.optional_import(slow_module)
+    assert slow_module not in sys.modules
+    assert module.value == 42
+    assert sys.modules[slow_module].value == 42
+    assert lazy.optional_import(slow_module) is sys.modules[slow_module]
+
+
+def test_threads_wait_for_the_module(slow_module):
+    module = lazy.optional_import(slow_module)
+    values = []
+    threads = [threading.Thread(target=lambda: values.append(module.value)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert values == [42] * 8
+    assert sys.modules['st7789v_slow_counter'].imports == 1
@@ -0,0 +1,49 @@
+"""Tests of the Raspberry Pi interface, with fake RPi.GPIO and spidev modules."""
+import pytest
+
+
+def test_spidev_bufsiz(raspberry, tmp_path):
+    bufsiz = tmp_path / 'bufsiz'
+    assert raspberry.spidev_bufsiz(str(bufsiz)) == 4096
+    bufsiz.write_text('65536\n')
+    assert raspberry.spidev_bufsiz(str(bufsiz)) == 65536
+    bufsiz.write_text('invalid\n')
+    assert raspberry.spidev_bufsiz(str(bufsiz)) == 4096
+
+
+def test_spi_limit_defaults_to_bufsiz(raspberry, monkeypatch):
+    monkeypatch.setattr(raspberry, 'spidev_bufsiz', lambda: 4096)
+    assert raspberry.RaspberryPi().spi_limit == 4096
+    assert raspberry.RaspberryPi(spi_limit=1024).spi_limit == 1024
+
+
+def test_writebytes2(raspberry):
+    with raspberry.RaspberryPi(spi_limit=4096, backlight='gpio') as rpi:
+        spi = rpi._spi  # pylint: disable=W0212
+        data = bytes(range(256)) * 40
+        rpi.spi_write(data)
+        assert spi.writes == [('writebytes2', data)]
+
+
+@pytest.mark.parametrize('size', [1, 4095, 4096, 4097, 10000])
+def test_chunked_writes(raspberry, size):
+    raspberry.spidev.SpiDev.has_writebytes2 = False
+    with raspberry.RaspberryPi(spi_limit=4096, backlight='gpio') as rpi:
+        spi = rpi._spi  # pylint: disable=W0212
+        data = bytearray(i % 251 for i in range(size))
+        rpi.spi_write(memoryview(data))
+        assert all(method == 'writebytes' for method, _ in spi.writes)
+        assert [len(chunk) for _, chunk in spi.writes] == [min(4096, size - i) for i in range(0, size, 4096)]
+        assert b''.join(chunk for _, chunk in spi.writes) == data
+
+
+def test_spi_speed_hz(raspberry):
+    rpi = raspberry.RaspberryPi(spi_speed_hz=10000000, spi_limit=4096, backlight='gpio')
+    rpi.spi_speed_hz = 20000000
+    with rpi:
+        spi = rpi._spi  # pylint: disable=W0212
+        assert spi.max_speed_hz == 20000000
+        rpi.spi_speed_hz = 62.5e6
+        assert spi.max_speed_hz == 62500000
+        assert rpi.spi_speed_hz == 62500000
+    assert spi.closed